@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+# Conditional fetch across a venue outage, on the recorded payloads (bench/fixtures.py).
+#   python bench/fetch_check.py [--ex gate]
+# Per venue, for the full ticker list and the nets catalog: fetch, fail (404, then a body that does not decode),
+# recover with the byte-identical payload. A recovered venue must come back with its full result, not the empty
+# one from the failure. Prints one line per step, exits 1 on the first mismatch.
+import os, sys, argparse
+import urllib.parse as urlparse
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import fixtures
+engine = fixtures.engine
+
+KEYS = {ex:{"api_key":"k", "secret":"c2VjcmV0", "passphrase":"p"} for ex in engine.EXCHS}
+
+def check(name, got, want):
+    ok=(got>0)==want
+    print(f"{name:32} {got:>6}  {'ok' if ok else 'FAIL'}")
+    if not ok: sys.exit(1)
+
+def outage(ad, ex, name, size):
+    # size() -> entries the engine holds for ex after one fetch
+    u=urlparse.urlsplit(fixtures.ENDPOINTS[(ex, name)][0]); key=(u.hostname, u.path); body=ad.bodies[key]
+    check(f"{ex} {name} first", size(), True)
+    check(f"{ex} {name} same payload", size(), True)
+    for fail in (None, b"<html>502 Bad Gateway</html>"):
+        if fail is None: ad.bodies.pop(key)
+        else: ad.bodies[key]=fail
+        check(f"{ex} {name} {'404' if fail is None else 'bad body'}", size(), False)
+        ad.bodies[key]=body
+        check(f"{ex} {name} recovered", size(), True)
+        check(f"{ex} {name} recovered, same", size(), True)
+
+def nets(ex):
+    engine.NET._load(ex, KEYS[ex])
+    return len(engine.NET.store.get(ex) or {}) if ex not in engine.NET.fails else 0
+
+if __name__=="__main__":
+    ap=argparse.ArgumentParser(); ap.add_argument("--ex", nargs="+", default=["gate"])
+    a=ap.parse_args()
+    ad=fixtures.install(fixtures.DIR)
+    for ex in a.ex:
+        outage(ad, ex, "tickers", lambda: len(engine.ticker_book(ex)))
+        if (ex, "nets") in fixtures.ENDPOINTS: outage(ad, ex, "nets", lambda: nets(ex))
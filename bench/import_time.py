@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+# Import cost of the headless path (engine.py): best of N fresh interpreters, heaviest modules, and a check
+# that nothing from the UI stack or the optional live-feed client gets pulled in.
+#   python bench/import_time.py [runs] [module]
+import os, sys, json, subprocess
+
+ROOT=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FORBIDDEN=("kivy", "websocket")
+
+def one(module):
+    code=f"import sys, {module}; print(' '.join(sorted({{m.split('.')[0] for m in sys.modules}})))"
+    p=subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT, capture_output=True, text=True)
+    if p.returncode: sys.exit(p.stderr)
+    rows=[]
+    for line in p.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line or "self" in line: continue
+        _, cum, name = line.split("|")
+        rows.append((name.strip(), len(name)-len(name.lstrip()), int(cum)))
+    total=next(c for n,_,c in rows if n==module)
+    # direct children of the module (importtime indents two spaces per level)
+    top={n:c for n,d,c in rows if d==3}
+    return total, top, set(p.stdout.split())
+
+def main_():
+    runs=int(sys.argv[1]) if len(sys.argv)>1 else 5
+    module=sys.argv[2] if len(sys.argv)>2 else "engine"
+    res=[one(module) for _ in range(runs)]
+    total, top, mods = min(res, key=lambda r: r[0])
+    bad=[m for m in FORBIDDEN if m in mods]
+    print(json.dumps({"module":module, "runs":runs, "import_ms":round(total/1000,1),
+                      "heaviest":{n:round(c/1000,1) for n,c in sorted(top.items(), key=lambda kv: -kv[1])[:6]},
+                      "forbidden_loaded":bad}))
+    if bad: sys.exit(1)
+
+if __name__=="__main__":
+    main_()
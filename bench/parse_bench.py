@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+# Ticker parsing throughput on the recorded payloads (bench/fixtures.py).
+#   python bench/parse_bench.py [--runs 7] [--out parse.json]
+# Per exchange: payload size, decode time (json, and orjson when installed), parse time of the shared symbol-map
+# parser cold (empty map) and warm, the old per-row normalize + suffix loop on the same rows, and the end-to-end
+# tickers_* call through the stub. One JSON document on stdout.
+import os, sys, json, time, argparse
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import fixtures
+engine = fixtures.engine
+try: import orjson
+except ImportError: orjson = None
+
+# ex -> (rows out of the decoded payload, symbol, bid, ask) for the venues on parse_rows
+ROWS = {
+    "binance": (lambda j: j, "symbol", "bidPrice", "askPrice"),
+    "okx":     (lambda j: j["data"], "instId", "bidPx", "askPx"),
+    "gate":    (lambda j: j, "currency_pair", "highest_bid", "lowest_ask"),
+    "mexc":    (lambda j: j, "symbol", "bidPrice", "askPrice"),
+    "bitget":  (lambda j: j["data"], "symbol", "bidPr", "askPr"),
+    "xt":      (lambda j: j["result"], "s", "bp", "ap"),
+    "bitmart": (lambda j: j["data"]["tickers"], "symbol", "best_bid", "best_ask"),
+    "htx":     (lambda j: j["data"], "symbol", "bid", "ask"),
+}
+
+def legacy(rows, sym, bid, ask):
+    # the loop every tickers_* used to carry
+    out={}
+    for it in rows:
+        s=engine.norm_pairkey(it.get(sym,""))
+        for q in ("USDT","USDC","BTC","ETH"):
+            if s.endswith(q):
+                out[(s[:-len(q)],q)]={"bid": float(it.get(bid) or 0), "ask": float(it.get(ask) or 0)}
+                break
+    return out
+
+def best_of(fn, runs, before=None):
+    ts=[]
+    for _ in range(runs):
+        if before: before()
+        t0=time.perf_counter(); fn(); ts.append(time.perf_counter()-t0)
+    return round(min(ts)*1000, 3)
+
+def main_():
+    ap=argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=7); ap.add_argument("--fixtures", default=fixtures.DIR); ap.add_argument("--out")
+    a=ap.parse_args()
+    fixtures.install(a.fixtures); bodies=fixtures.load_bodies(a.fixtures)
+    doc={"orjson":orjson is not None, "runs":a.runs, "results":{}}
+    for ex in engine.TICKERS:
+        url,_=fixtures.ENDPOINTS[(ex,"tickers")]; u=engine.urlparse.urlsplit(url)
+        raw=bodies[(u.hostname, u.path)]
+        res={"bytes":len(raw), "decode_json_ms":best_of(lambda: json.loads(raw), a.runs)}
+        if orjson: res["decode_orjson_ms"]=best_of(lambda: orjson.loads(raw), a.runs)
+        clear=lambda: engine._SYMMAP.pop(ex, None)
+        if ex in ROWS:
+            pick, sym, bid, ask = ROWS[ex]; rows=pick(json.loads(raw))
+            res["rows"]=len(rows)
+            res["legacy_ms"]=best_of(lambda: legacy(rows, sym, bid, ask), a.runs)
+            res["parse_cold_ms"]=best_of(lambda: engine.parse_rows(ex, rows, sym, bid, ask), a.runs, clear)
+            res["parse_warm_ms"]=best_of(lambda: engine.parse_rows(ex, rows, sym, bid, ask), a.runs)
+            res["rows_per_s"]=round(len(rows)/(res["parse_warm_ms"]/1000)) if res["parse_warm_ms"] else None
+        res["tickers_ms"]=best_of(engine.TICKERS[ex], a.runs)
+        res["symbols"]=len(engine.TICKERS[ex]())
+        doc["results"][ex]=res
+    s=json.dumps(doc)
+    print(s)
+    if a.out:
+        with open(a.out, "w") as f: f.write(s+"\n")
+
+if __name__=="__main__":
+    main_()
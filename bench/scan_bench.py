@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+# Scan pipeline benchmark on recorded payloads (bench/fixtures.py), served through the stub HTTP layer.
+#   python bench/scan_bench.py [--venues 2 5 10] [--runs 5] [--out bench.json] [--compare old.json]
+# Per venue count: ticker and network parse time per exchange, join, route/compute, end-to-end scan (cold and warm
+# caches) and peak traced memory of a cold scan. One JSON document on stdout (and --out), stable keys across commits.
+import os, sys, json, time, argparse, platform, subprocess, tracemalloc
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import fixtures
+engine = fixtures.engine
+
+NOTIONAL, MIN_PCT, MIN_ABS = 100.0, 0.2, 0.5
+KEYS = {ex:{"api_key":"k", "secret":"c2VjcmV0", "passphrase":"p"} for ex in engine.EXCHS}
+
+def best_of(fn, runs):
+    ts=[]; res=None
+    for _ in range(runs):
+        t0=time.perf_counter(); res=fn(); ts.append(time.perf_counter()-t0)
+    return round(min(ts)*1000, 3), res
+
+def cold():
+    # as after a fresh start without a cache file: no wallet store (invalidate() alone keeps serving it while
+    # stale), no parsed payloads or validators to revalidate against, no learned symbol maps
+    net=engine.NET
+    with net._lock:
+        net.store.clear(); net.ts.clear(); net.ats.clear(); net.fails.clear(); net._disk.clear()
+    engine._PARSED.clear(); engine._VALIDATORS.clear(); engine._SYMMAP.clear(); engine._SYMBOLS.clear()
+    engine.ROUTES.__init__(); engine.ASSETS.retry.clear()
+
+def resolve(books, exs):
+    # per-asset wallets (Kraken) are filled in the background by the scan; here they are resolved up front
+    for ex in exs:
+        if ex in engine.LAZY_NETS: engine.ASSETS.want(ex, engine.overlap_assets(ex, books), KEYS)
+    engine.ASSETS.drain()
+
+def routes(books, rates):
+    out=[]
+    for base, q, src, dst, ask, bid, q2 in engine.join_books(books, rates, NOTIONAL, MIN_PCT, MIN_ABS):
+        best=engine.best_route(base, src, dst, ask, bid, NOTIONAL, KEYS, q!=q2)
+        if best and best[2]>=MIN_ABS and best[3]>=MIN_PCT:
+            out.append(engine.make_row(base, q, src, dst, ask/rates[q], bid/rates[q2], best, q2))
+    out.sort(key=engine.rank_key)
+    return out
+
+def scan(exs):
+    return engine.scan_real(exs, engine.QUOTES, NOTIONAL, MIN_PCT, MIN_ABS, KEYS)
+
+def bench_venues(exs, runs):
+    res={"exchanges":exs, "parse_ms":{}, "nets_ms":{}, "symbols":{}}
+    books={}
+    for ex in exs:
+        res["parse_ms"][ex], books[ex] = best_of(engine.TICKERS[ex], runs)
+        res["symbols"][ex]=len(books[ex])
+        if ex not in engine.LAZY_NETS: res["nets_ms"][ex], _ = best_of(lambda: engine.NET_FETCHERS[ex](KEYS[ex]), runs)
+    rates=engine.quote_rates(books)
+    res["join_ms"], cands = best_of(lambda: engine.join_books(books, rates, NOTIONAL, MIN_PCT, MIN_ABS), runs)
+    res["candidates"]=len(cands)
+    cold(); [engine.NET.fetch(ex, KEYS[ex]) for ex in exs if ex not in engine.LAZY_NETS]
+    resolve(books, exs); routes(books, rates)   # fills per-asset wallets and ROUTES once
+    res["compute_ms"], rows = best_of(lambda: routes(books, rates), runs)
+    res["rows"]=len(rows)
+    scan_cold=[]
+    for _ in range(runs):
+        cold(); t0=time.perf_counter(); scan(exs); scan_cold.append(time.perf_counter()-t0)
+    res["scan_cold_ms"]=round(min(scan_cold)*1000, 3)
+    res["scan_warm_ms"], _ = best_of(lambda: scan(exs), runs)
+    cold(); tracemalloc.start(); scan(exs)
+    res["peak_kb"]=round(tracemalloc.get_traced_memory()[1]/1024); tracemalloc.stop()
+    return res
+
+def commit():
+    try: return subprocess.run(["git","rev-parse","--short","HEAD"], capture_output=True, text=True,
+                               cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError: return None
+
+def flat(doc):
+    # "venues.metric[.exchange]" -> number, for comparisons
+    out={}
+    for n, r in doc["results"].items():
+        for k, v in r.items():
+            if k.endswith("_ms") or k=="peak_kb":
+                if isinstance(v, dict):
+                    for ex, x in v.items(): out[f"{n}.{k}.{ex}"]=x
+                else: out[f"{n}.{k}"]=v
+    return out
+
+def compare(old, new, threshold):
+    a, b = flat(old), flat(new); worse=[]
+    for k in sorted(b):
+        if k not in a or not a[k]: continue
+        ratio=b[k]/a[k]
+        if ratio>threshold: worse.append(k)
+        print(f"{k:40} {a[k]:>10} {b[k]:>10} {ratio:6.2f}{'  !' if ratio>threshold else ''}", file=sys.stderr)
+    return worse
+
+def main_():
+    ap=argparse.ArgumentParser()
+    ap.add_argument("--venues", nargs="+", type=int, default=[2,5,10]); ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--fixtures", default=fixtures.DIR); ap.add_argument("--out")
+    ap.add_argument("--compare"); ap.add_argument("--threshold", type=float, default=1.25)
+    a=ap.parse_args()
+    stub=fixtures.install(a.fixtures)
+    order=list(engine.TICKERS)
+    doc={"commit":commit(), "python":platform.python_version(), "numpy":engine.np is not None, "runs":a.runs,
+         "filters":{"notional":NOTIONAL, "min_pct":MIN_PCT, "min_abs":MIN_ABS}, "results":{}}
+    for n in a.venues:
+        doc["results"][str(n)]=bench_venues(order[:n], a.runs)
+    doc["stub_requests"]=sum(stub.hits.values())
+    s=json.dumps(doc)
+    print(s)
+    if a.out:
+        with open(a.out, "w") as f: f.write(s+"\n")
+    if a.compare:
+        with open(a.compare) as f: old=json.load(f)
+        if compare(old, doc, a.threshold): sys.exit(1)
+
+if __name__=="__main__":
+    main_()
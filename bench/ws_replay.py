@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+# Local WebSocket stand-in: replays recorded frames to every client that connects (stdlib only).
+#   python bench/ws_replay.py record out.jsonl --ex binance okx --seconds 60
+#   python bench/ws_replay.py serve frames.jsonl [--port 8765] [--speed 10] [--ex binance]
+#   python bench/ws_replay.py selftest
+# frames.jsonl: {"t": seconds since start, "ex": exchange, "data": text frame} | {..., "b64": binary frame}
+import os, sys, socket, threading, base64, hashlib, struct, json, time, gzip, argparse
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+def _read(conn, n):
+    buf=b""
+    while len(buf)<n:
+        d=conn.recv(n-len(buf))
+        if not d: raise ConnectionError("closed")
+        buf+=d
+    return buf
+
+def _frame(payload, opcode):
+    n=len(payload); h=bytes([0x80|opcode])
+    if n<126: h+=bytes([n])
+    elif n<65536: h+=bytes([126])+struct.pack(">H", n)
+    else: h+=bytes([127])+struct.pack(">Q", n)
+    return h+payload
+
+def _recv_frame(conn):
+    b0, b1 = _read(conn, 2)
+    n=b1&0x7f
+    if n==126: (n,)=struct.unpack(">H", _read(conn, 2))
+    elif n==127: (n,)=struct.unpack(">Q", _read(conn, 8))
+    mask=_read(conn, 4) if b1&0x80 else b"\0\0\0\0"
+    data=bytes(c^mask[i%4] for i,c in enumerate(_read(conn, n)))
+    return b0&0x0f, data
+
+def _handshake(conn):
+    buf=b""
+    while b"\r\n\r\n" not in buf:
+        d=conn.recv(4096)
+        if not d: return False
+        buf+=d
+    key=None
+    for line in buf.decode("latin1").split("\r\n"):
+        if line.lower().startswith("sec-websocket-key:"): key=line.split(":",1)[1].strip()
+    if not key: return False
+    acc=base64.b64encode(hashlib.sha1((key+GUID).encode()).digest()).decode()
+    conn.sendall(("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                  f"Sec-WebSocket-Accept: {acc}\r\n\r\n").encode())
+    return True
+
+class ReplayServer:
+    def __init__(self, frames, port=0, speed=1.0, hold=True):
+        self.frames=sorted(frames, key=lambda f: f.get("t", 0)); self.speed=speed; self.hold=hold
+        self.received=[]   # client → server text messages (subscriptions, pongs)
+        self.sock=socket.socket(); self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind(("127.0.0.1", port)); self.sock.listen(8)
+        self.port=self.sock.getsockname()[1]
+    @property
+    def url(self): return f"ws://127.0.0.1:{self.port}"
+    def start(self):
+        threading.Thread(target=self._accept, daemon=True).start(); return self
+    def close(self):
+        try: self.sock.close()
+        except Exception: pass
+    def _accept(self):
+        while True:
+            try: conn,_=self.sock.accept()
+            except OSError: return
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+    def _reader(self, conn):
+        try:
+            while True:
+                op, data = _recv_frame(conn)
+                if op==8: conn.sendall(_frame(b"", 8)); return
+                if op==9: conn.sendall(_frame(data, 10))
+                elif op==1: self.received.append(data.decode())
+        except Exception: pass
+    def _serve(self, conn):
+        try:
+            if not _handshake(conn): return
+            threading.Thread(target=self._reader, args=(conn,), daemon=True).start()
+            t0=time.time()
+            for f in self.frames:
+                dt=f.get("t", 0)/self.speed-(time.time()-t0)
+                if dt>0: time.sleep(dt)
+                if "b64" in f: conn.sendall(_frame(base64.b64decode(f["b64"]), 2))
+                else: conn.sendall(_frame(f["data"].encode(), 1))
+            if self.hold: time.sleep(3600)   # اتصال باز بماند؛ قطعی را کلاینت تشخیص می‌دهد
+        except Exception: pass
+        finally: conn.close()
+
+def load_frames(path, ex=None):
+    with (gzip.open if path.endswith(".gz") else open)(path, "rt") as f:
+        fr=[json.loads(l) for l in f if l.strip()]
+    return [x for x in fr if not ex or x.get("ex")==ex]
+
+def record(path, exchanges, quotes, seconds):
+    import engine
+    lock=threading.Lock(); t0=time.time()
+    f=(gzip.open if path.endswith(".gz") else open)(path, "wt")
+    def rec(ex, raw, now):
+        fr={"t":round(now-t0, 4), "ex":ex}
+        if isinstance(raw, bytes): fr["b64"]=base64.b64encode(raw).decode()
+        else: fr["data"]=raw
+        with lock: f.write(json.dumps(fr)+"\n")
+    engine.FEEDS.start(exchanges, quotes, record=rec)
+    time.sleep(seconds); engine.FEEDS.stop(); f.close()
+
+def selftest():
+    import engine
+    if engine.load_websocket() is None: sys.exit("websocket-client not installed")
+    ok=True
+    # binance: plain text deltas
+    frames=[{"t":0.05*i, "data":json.dumps({"u":i, "s":"BTCUSDT", "b":str(100+i), "B":"1", "a":str(101+i), "A":"1"})} for i in range(5)]
+    srv=ReplayServer(frames).start(); st=engine.QuoteStore()
+    feed=engine.WSFeed("binance", [("BTC","USDT")], store=st, url=srv.url, snapshot=False).start()
+    time.sleep(1.0); q=st.books.get("binance", {}).get(("BTC","USDT"))
+    print("binance", feed.state, q, srv.received[:1]); ok&=bool(q and q["bid"]==104.0 and srv.received)
+    feed.stop(); srv.close()
+    # htx: gzip binary + ping/pong
+    def gz(o): return base64.b64encode(gzip.compress(json.dumps(o).encode())).decode()
+    frames=[{"t":0, "b64":gz({"ping":123})},
+            {"t":0.1, "b64":gz({"ch":"market.ethusdt.bbo", "ts":1700000000000, "tick":{"symbol":"ethusdt", "bid":2000.5, "ask":2001}})}]
+    srv=ReplayServer(frames).start(); st=engine.QuoteStore()
+    feed=engine.WSFeed("htx", [("ETH","USDT")], store=st, url=srv.url, snapshot=False).start()
+    time.sleep(1.0); q=st.books.get("htx", {}).get(("ETH","USDT"))
+    pong=any('"pong": 123' in m for m in srv.received)
+    print("htx", feed.state, q, pong); ok&=bool(q and q["vts"]==1700000000000 and pong)
+    feed.stop(); srv.close()
+    # reconnect with backoff after the server drops the connection
+    frames=[{"t":0, "data":json.dumps({"channel":"spot.book_ticker", "event":"update", "result":{"t":1, "s":"BTC_USDT", "b":"5", "a":"6"}})}]
+    srv=ReplayServer(frames, hold=False).start(); st=engine.QuoteStore()
+    feed=engine.WSFeed("gate", [("BTC","USDT")], store=st, url=srv.url, snapshot=False).start()
+    time.sleep(3.0); q=st.books.get("gate", {}).get(("BTC","USDT"))
+    print("gate", feed.state, feed.reconnects, q); ok&=feed.reconnects>=1 and bool(q)
+    feed.stop(); srv.close()
+    print("OK" if ok else "FAIL"); sys.exit(0 if ok else 1)
+
+if __name__=="__main__":
+    ap=argparse.ArgumentParser()
+    sub=ap.add_subparsers(dest="cmd", required=True)
+    r=sub.add_parser("record"); r.add_argument("out"); r.add_argument("--ex", nargs="+", default=["binance","okx"])
+    r.add_argument("--quotes", nargs="+", default=["USDT","USDC","BTC","ETH"]); r.add_argument("--seconds", type=float, default=60)
+    s=sub.add_parser("serve"); s.add_argument("frames"); s.add_argument("--port", type=int, default=8765)
+    s.add_argument("--speed", type=float, default=1.0); s.add_argument("--ex")
+    sub.add_parser("selftest")
+    a=ap.parse_args()
+    if a.cmd=="record": record(a.out, a.ex, tuple(a.quotes), a.seconds)
+    elif a.cmd=="serve":
+        srv=ReplayServer(load_frames(a.frames, a.ex), a.port, a.speed).start()
+        print(srv.url); threading.Event().wait()
+    else: selftest()
@@ -7,7 +7,9 @@ version = 0.5.0
 source.dir = .
 source.main = main.py
 source.include_exts = py,kv,png,jpg,ttf,json
-requirements = python3,kivy,requests,ccxt,urllib3,certifi,idna,chardet
+source.exclude_dirs = bench
+source.exclude_patterns = cli.py,replay.py
+requirements = python3,kivy,requests,ccxt,urllib3,certifi,idna,chardet,websocket-client,sqlite3,plyer
 orientation = portrait
 fullscreen = 0
 log_level = 2
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+# Headless scanner: the app's engine without Kivy, for servers and cron. Rows go to stdout, scan stats to stderr.
+#   python cli.py --keys secrets.enc [--ex binance okx ...] [--interval 15 | --once] [--format jsonl|csv]
+#   PIN from $ARBTRACKER_PIN, otherwise asked on the terminal
+import os, sys, csv, json, time, getpass, argparse
+_t0=time.perf_counter()
+import engine
+from history import HISTORY
+IMPORT_MS=(time.perf_counter()-_t0)*1000
+
+CSV_COLS=["ts","sym","q","q2","src","dst","ask","bid","net$","net%","net","wd","fees","max$","since","age","quality"]
+
+def emit(rows, fmt, out, ts, writer=None):
+    for r in rows:
+        d={k:v for k,v in r.items() if k not in ("key", "legs", "base")}; d["ts"]=ts; d["fees"]=engine.row_fees(r)
+        if fmt=="csv": writer.writerow({k:d.get(k, "") for k in CSV_COLS})
+        else: out.write(json.dumps(d, ensure_ascii=False)+"\n")
+    out.flush()
+
+def fetch_totals():
+    # cumulative over the run: KB received, KB a 304 spared, payloads whose parse was skipped
+    st=engine.fetch_stats().values()
+    return {"wire_kb":sum(v["wire"] for v in st)//1024, "saved_kb":sum(v["saved"] for v in st)//1024,
+            "unchanged":sum(v["304"]+v["same"] for v in st)}
+
+def pool_totals():
+    # cumulative over the run: connections opened vs requests that went out on a kept-alive one
+    st=engine.http_pool_stats().values()
+    return {"opened":sum(v["new"] for v in st), "reused":sum(v["reused"] for v in st)}
+
+def main():
+    ap=argparse.ArgumentParser(description="ArbTracker headless scanner")
+    ap.add_argument("--keys", required=True, help="secrets.enc exported from the app")
+    ap.add_argument("--pin-env", default="ARBTRACKER_PIN")
+    ap.add_argument("--ex", nargs="+", default=list(engine.EXCHS), choices=list(engine.EXCHS))
+    ap.add_argument("--quotes", nargs="+", default=list(engine.QUOTES), choices=list(engine.QUOTES))
+    ap.add_argument("--notional", type=float, default=100.0)
+    ap.add_argument("--min-pct", type=float, default=0.2)
+    ap.add_argument("--min-abs", type=float, default=0.5)
+    ap.add_argument("--interval", type=float, default=15.0)
+    ap.add_argument("--adaptive", action="store_true", help="--interval is the base; cadence and venues follow activity/health")
+    ap.add_argument("--limit", type=int, default=engine.TOP_K, help="best rows per scan (0 = all)")
+    ap.add_argument("--once", action="store_true")
+    ap.add_argument("--format", choices=("jsonl","csv"), default="jsonl")
+    ap.add_argument("--depth", action="store_true"); ap.add_argument("--cycles", action="store_true")
+    ap.add_argument("--live", action="store_true", help="WebSocket top-of-book, REST for the rest")
+    ap.add_argument("--max-skew", type=float, default=engine.MAX_SKEW,
+                    help="drop routes with a quote older than this many seconds (0 = keep all)")
+    ap.add_argument("--cache", default=None, help="network cache file (default: next to --keys)")
+    ap.add_argument("--record", default=None, metavar="FILE", help="append raw payloads of every scan (replay.py)")
+    ap.add_argument("--history", default=None, metavar="DB", help="append every scan to this SQLite history file")
+    ap.add_argument("--metrics", default=None, metavar="PATH", help="collect stage/request metrics, write them as JSON on exit")
+    a=ap.parse_args()
+
+    pin=os.environ.get(a.pin_env) or getpass.getpass("PIN: ")
+    try: keys=engine.load_keys(a.keys, pin)
+    except (OSError, ValueError) as e: sys.exit(f"keys: {e}")
+    gated=engine.gate_exchanges(a.ex, keys)
+    if len(gated)<2: sys.exit(f"need keys for at least two exchanges, have: {', '.join(gated) or 'none'}")
+    engine.NET.attach(a.cache or os.path.join(os.path.dirname(os.path.abspath(a.keys)), "netcache.bin"))
+    if a.metrics: engine.METRICS.enable()
+    if a.history: HISTORY.open(a.history)
+    rec=None
+    if a.record:
+        import replay
+        rec=replay.Recorder(a.record)
+    if a.live: engine.FEEDS.start(gated, tuple(a.quotes))
+    print(json.dumps({"import_ms":round(IMPORT_MS,1), "exchanges":gated}), file=sys.stderr)
+
+    writer=None
+    if a.format=="csv":
+        writer=csv.DictWriter(sys.stdout, fieldnames=CSV_COLS); writer.writeheader()
+    n=0; engine.SCHED.base=a.interval
+    try:
+        while True:
+            t=time.time(); stats={}
+            exs, full = engine.SCHED.plan(gated, keys) if a.adaptive else (gated, True)
+            rows=engine.scan_real(exs, tuple(a.quotes), a.notional, a.min_pct, a.min_abs, keys,
+                                  live=a.live, depth=a.depth, cycles=a.cycles, stats=stats, max_skew=a.max_skew or None,
+                                  limit=a.limit or None)
+            if a.adaptive: engine.SCHED.record(exs, full, rows, stats, time.time()-t)
+            if a.history: HISTORY.record(rows, stats, t)
+            if rec: rec.scan(t, exs, stats)
+            emit(rows, a.format, sys.stdout, round(t, 3), writer)
+            n+=1
+            print(json.dumps({"scan":n, "ms":round((time.time()-t)*1000), "rows":len(rows), "quotes":stats.get("quotes", {}),
+                              "lat":{ex:(round(v*1000) if v is not None else None) for ex,v in (stats.get("lat") or {}).items()},
+                              "live":stats.get("live", []), "wallets_pending":stats.get("wallets_pending", {}),
+                              "throttled":stats.get("throttled", {}), "stale":stats.get("stale", 0), "more":stats.get("more", 0),
+                              "sched":engine.SCHED.status() if a.adaptive else None,
+                              "fetch":fetch_totals(), "conns":pool_totals()}), file=sys.stderr)
+            if a.once: break
+            if a.adaptive: time.sleep(engine.SCHED.delay)   # measured from the end of the scan
+            else: time.sleep(max(0.0, a.interval-(time.time()-t)))
+    except KeyboardInterrupt: pass
+    finally:
+        engine.FEEDS.stop(); engine.NET.save()
+        if a.metrics: engine.METRICS.export(a.metrics)
+        if a.history: HISTORY.close()
+        if rec: rec.close()
+
+if __name__=="__main__":
+    main()
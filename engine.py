@@ -0,0 +1,1983 @@
+# -*- coding: utf-8 -*-
+# ArbTracker engine — HTTP, networks, tickers, feeds and the scan itself; no Kivy, so it runs headless too
+import os, gc, json, time, math, heapq, hmac, hashlib, base64, secrets, threading, contextlib, mmap, struct, zlib, gzip
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, List, Optional, Tuple
+import urllib.parse as urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+import pyaes  # AES-CTR (pure python)
+try:
+    import numpy as np   # اختیاری: محاسبه‌ی برداری اسپردها
+except ImportError:
+    np = None
+try:
+    import orjson        # اختیاری: decode سریع‌تر payloadهای بزرگ tickers/currencies
+except ImportError:
+    orjson = None
+websocket = None         # websocket-client، اختیاری: فقط وقتی فید زنده شروع شود import می‌شود (load_websocket)
+
+TIMEOUT = 15
+UA = {"User-Agent": "ArbTrackerAPK/1.0"}
+json_loads = orjson.loads if orjson else json.loads   # bytes in, same objects out
+
+# ---------- Instrumentation ----------
+# پیش‌فرض خاموش: stage() یک context خالیِ مشترک برمی‌گرداند و بقیه‌ی نقاط با `if METRICS.on` رد می‌شوند
+class _Stage:
+    __slots__=("m","name","t0")
+    def __init__(self, m, name): self.m=m; self.name=name
+    def __enter__(self): self.t0=time.perf_counter(); return self
+    def __exit__(self, *exc): self.m.time(self.name, time.perf_counter()-self.t0)
+
+_NULL_STAGE = contextlib.nullcontext()
+_tl = threading.local()   # per-thread HTTP seconds, so ticker time splits into fetch / parse
+
+class Metrics:
+    # stages: name -> {n,total,last,max} seconds; hosts: host -> {n,total,last,max,bytes,errors}; counters: name -> n
+    def __init__(self):
+        self.on=False; self._lock=threading.Lock(); self.reset()
+    def enable(self, on=True): self.on=bool(on)
+    def reset(self):
+        with self._lock:
+            self.stages={}; self.hosts={}; self.counters={}; self.since=time.time()
+    def stage(self, name):
+        return _Stage(self, name) if self.on else _NULL_STAGE
+    def time(self, name, sec):
+        with self._lock:
+            st=self.stages.get(name)
+            if st is None: st=self.stages[name]={"n":0, "total":0.0, "last":0.0, "max":0.0}
+            st["n"]+=1; st["total"]+=sec; st["last"]=sec
+            if sec>st["max"]: st["max"]=sec
+    def count(self, name, n=1):
+        with self._lock: self.counters[name]=self.counters.get(name, 0)+n
+    def req(self, host, sec, nbytes=0, err=None):
+        _tl.http=getattr(_tl, "http", 0.0)+sec
+        with self._lock:
+            h=self.hosts.get(host)
+            if h is None: h=self.hosts[host]={"n":0, "total":0.0, "last":0.0, "max":0.0, "bytes":0, "errors":{}}
+            h["n"]+=1; h["total"]+=sec; h["last"]=sec; h["bytes"]+=nbytes
+            if sec>h["max"]: h["max"]=sec
+            if err: h["errors"][err]=h["errors"].get(err, 0)+1
+    def snapshot(self):
+        # other subsystems' state is read outside _lock: they call into METRICS under their own locks
+        with self._lock:
+            snap={"enabled":self.on, "since":self.since, "at":time.time(),
+                  "stages":{k:dict(v) for k,v in self.stages.items()},
+                  "requests":{h:dict(v, errors=dict(v["errors"])) for h,v in self.hosts.items()},
+                  "counters":dict(self.counters)}
+        for h,v in snap["requests"].items(): v["ex"]=host_exchange(h)
+        snap.update(governor=GOV.snapshot(), fetch=fetch_stats(), pool=http_pool_stats(), scheduler=SCHED.status())
+        return snap
+    def export(self, path):
+        with open(path, "w") as f: json.dump(self.snapshot(), f, indent=1, sort_keys=True)
+        return path
+METRICS = Metrics()
+
+def _req_error(e, r):
+    if r is not None and r.status_code>=400: return f"HTTP {r.status_code}"
+    return type(e).__name__
+
+# ---------- Rate limits ----------
+# بودجه‌ی هر اکسچنج (وزن درخواست بر ثانیه، burst) از محدودیت‌های منتشرشده؛ اولویت: tickers → depth → metadata.
+# 429/418 اکسچنج را تا Retry-After می‌بندد؛ درخواستی که بیشتر از max_wait منتظر بماند None برمی‌گرداند، نه ban
+PRIO_TICKER, PRIO_DEPTH, PRIO_META = 0, 1, 2
+RATE_LIMITS = {
+    "binance": (100.0, 1200),       # 6000 weight / min (IP)
+    "okx":     (10.0, 20),          # 20 req / 2s per endpoint
+    "gate":    (20.0, 200),         # 200 req / 10s per endpoint
+    "mexc":    (50.0, 500),         # 500 req / 10s
+    "bitget":  (20.0, 20),          # 20 req / s
+    "xt":      (10.0, 10),
+    "bitmart": (5.0, 10),           # 10 req / 2s
+    "htx":     (10.0, 100),         # 100 req / 10s
+    "kraken":  (1.0, 15),           # public: ~1 req / s
+    "kraken.private": (0.33, 15),   # counter +1 per call, decays 0.33/s, cap 15 (starter key)
+    "bitrue":  (20.0, 1200),        # 1200 weight / min
+}
+REQ_WEIGHT = {   # url (no query) -> weight; 1 otherwise
+    "https://api.binance.com/api/v3/ticker/bookTicker": 4,
+    "https://api.binance.com/api/v3/depth": 5,
+    "https://api.binance.com/sapi/v1/capital/config/getall": 10,
+    "https://api.mexc.com/api/v3/ticker/bookTicker": 2,
+}
+USED_WEIGHT = {"binance": ("X-MBX-USED-WEIGHT-1M", 6000)}   # venue-reported usage → bucket never runs ahead of it
+GOV_BACKOFF_BASE, GOV_BACKOFF_MAX = 2, 120
+_prio_default = PRIO_META
+
+class TokenBucket:
+    # rate tokens/s, up to burst
+    def __init__(self, rate, burst):
+        self.rate=rate; self.burst=burst; self.tokens=float(burst); self.t=time.monotonic()
+        self._lock=threading.Lock()
+    def _fill(self):
+        now=time.monotonic(); self.tokens=min(self.burst, self.tokens+(now-self.t)*self.rate); self.t=now
+    def try_take(self, n=1):
+        # 0.0 if taken, else seconds until n tokens are there
+        with self._lock:
+            self._fill(); n=min(n, self.burst)
+            if self.tokens>=n: self.tokens-=n; return 0.0
+            return (n-self.tokens)/self.rate
+    def cap(self, tokens):
+        with self._lock: self._fill(); self.tokens=min(self.tokens, tokens)
+
+@contextlib.contextmanager
+def priority(p):
+    # requests made inside this block (same thread) queue in class p
+    old=getattr(_tl, "prio", _prio_default); _tl.prio=p
+    try: yield
+    finally: _tl.prio=old
+
+class Governor:
+    # per-budget waiters ordered by (priority, arrival); only the head may take tokens, so metadata never
+    # jumps ahead of a waiting ticker request
+    def __init__(self, limits):
+        self.buckets={k:TokenBucket(*v) for k,v in limits.items()}
+        self.blocked={}   # key -> wall time the venue is closed until (429/418)
+        self.strikes={}
+        self.stats={}     # key -> {req, waited, wait_s, depth, max_depth, throttled, limited}
+        self._q={}; self._seq=0; self._cv=threading.Condition()
+    def _st(self, key):
+        st=self.stats.get(key)
+        if st is None:
+            st=self.stats[key]={"req":0, "waited":0, "wait_s":0.0, "depth":0, "max_depth":0, "throttled":0, "limited":0}
+        return st
+    def acquire(self, key, weight=1, prio=None, max_wait=TIMEOUT):
+        b=self.buckets.get(key)
+        if b is None: return True
+        prio=getattr(_tl, "prio", _prio_default) if prio is None else prio
+        t0=time.monotonic(); end=t0+max_wait; ok=throttled=False
+        with self._cv:
+            self._seq+=1; me=(prio, self._seq); q=self._q.setdefault(key, [])
+            heapq.heappush(q, me)
+            st=self._st(key); st["req"]+=1; st["depth"]=len(q); st["max_depth"]=max(st["max_depth"], len(q))
+            try:
+                while True:
+                    now=time.monotonic()
+                    wait_s=self.blocked.get(key, 0)-time.time()
+                    if wait_s<=0 and q[0]==me:
+                        wait_s=b.try_take(weight)
+                        if not wait_s: ok=True; break
+                    if wait_s>0 and now+wait_s>end:
+                        st["throttled"]+=1; throttled=True; break
+                    if now>=end:
+                        st["throttled"]+=1; break
+                    self._cv.wait(min(wait_s, end-now) if wait_s>0 else end-now)
+            finally:
+                q.remove(me); heapq.heapify(q); st["depth"]=len(q)
+                w=time.monotonic()-t0
+                if w>0.001: st["waited"]+=1; st["wait_s"]+=w
+                self._cv.notify_all()
+        # METRICS only once _cv is released: Metrics.snapshot reads GOV, so the two locks are never nested this way
+        if METRICS.on:
+            if throttled: METRICS.count(f"throttled.{key}")
+            if w>0.001: METRICS.time(f"wait.{key}", w)
+        return ok
+    def observe(self, key, r):
+        if r.status_code in (429, 418):
+            ra=r.headers.get("Retry-After")
+            try: self.penalize(key, float(ra))
+            except (TypeError, ValueError): self.penalize(key)
+            return
+        self.strikes.pop(key, None)
+        uw=USED_WEIGHT.get(key); b=self.buckets.get(key)
+        if uw and b:
+            try: used=float(r.headers.get(uw[0]))
+            except (TypeError, ValueError): return
+            b.cap(b.burst*(1-used/uw[1]))
+    def penalize(self, key, sec=None):
+        # close key for sec (Retry-After) or an exponential backoff over consecutive strikes
+        with self._cv:
+            n=self.strikes.get(key, 0)+1; self.strikes[key]=n
+            if sec is None: sec=min(GOV_BACKOFF_MAX, GOV_BACKOFF_BASE*2**(n-1))
+            self.blocked[key]=max(self.blocked.get(key, 0), time.time()+sec)
+            self._st(key)["limited"]+=1
+            self._cv.notify_all()
+        if METRICS.on: METRICS.count(f"limited.{key}")
+    def blocked_for(self, key):
+        return max(0.0, self.blocked.get(key, 0)-time.time())
+    def snapshot(self):
+        with self._cv:
+            return {k:dict(st, blocked=round(self.blocked_for(k), 1)) for k,st in self.stats.items()}
+GOV = Governor(RATE_LIMITS)
+
+# ---------- HTTP ----------
+# یک Session پایدار برای هر هاست (keep-alive + gzip)، به‌جای handshake تازه در هر درخواست
+POOL_SIZE = 4
+HTTP_STATS = {}   # host -> {"req": requests sent, "new": connections opened}
+_stats_lock = threading.Lock()
+def _count(host, k):
+    with _stats_lock:
+        st = HTTP_STATS.setdefault(host, {"req":0,"new":0}); st[k]+=1
+
+class _CountingHTTPPool(HTTPConnectionPool):
+    def _new_conn(self):
+        _count(self.host, "new"); return super()._new_conn()
+
+class _CountingHTTPSPool(HTTPSConnectionPool):
+    def _new_conn(self):
+        _count(self.host, "new"); return super()._new_conn()
+
+class PooledAdapter(HTTPAdapter):
+    def init_poolmanager(self, *a, **kw):
+        super().init_poolmanager(*a, **kw)
+        self.poolmanager.pool_classes_by_scheme = {"http":_CountingHTTPPool, "https":_CountingHTTPSPool}
+
+_SESSIONS = {}
+_sess_lock = threading.Lock()
+def session_for(url):
+    host = urlparse.urlsplit(url).hostname or ""
+    with _sess_lock:
+        s = _SESSIONS.get(host)
+        if s is None:
+            s = requests.Session()
+            s.headers.update(UA); s.headers.update({"Accept-Encoding":"gzip, deflate", "Connection":"keep-alive"})
+            ad = PooledAdapter(pool_connections=1, pool_maxsize=POOL_SIZE, max_retries=0)
+            s.mount("https://", ad); s.mount("http://", ad)
+            _SESSIONS[host] = s
+    return host, s
+
+def http_pool_stats():
+    # host -> {"req", "new", "reused"}
+    with _stats_lock:
+        return {h: dict(st, reused=max(0, st["req"]-st["new"])) for h,st in HTTP_STATS.items()}
+
+HTTP_TAPS = []   # fn(response) after every successful request (replay.Recorder)
+
+def _send(method, url, key=None, acquire=True, **kw):
+    # one governed request -> Response (2xx) or None; key is the GOV budget (default: the host's exchange)
+    t0=time.perf_counter(); host=""; r=None
+    try:
+        host, s = session_for(url)
+        key=key or host_exchange(host)
+        if acquire and not GOV.acquire(key, REQ_WEIGHT.get(url, 1)):
+            if METRICS.on: METRICS.req(host, 0.0, 0, "throttled")
+            return None
+        _count(host, "req")
+        r = s.request(method, url, timeout=kw.pop("timeout", TIMEOUT), **kw)
+        GOV.observe(key, r)
+        r.raise_for_status()
+        if METRICS.on: METRICS.req(host, time.perf_counter()-t0, len(r.content))
+        _fetch_count(host, r)
+        for fn in HTTP_TAPS: fn(r)
+        return r
+    except Exception as e:
+        if METRICS.on: METRICS.req(host, time.perf_counter()-t0, len(r.content) if r is not None else 0, _req_error(e, r))
+        return None
+
+def http_get(url, params=None, headers=None, timeout=TIMEOUT):
+    if getattr(_tl, "memo", None) is not None: return _get_memo(url, params, headers, timeout)
+    r=_send("GET", url, params=params or {}, headers=headers, timeout=timeout)
+    try: return json_loads(r.content) if r is not None else None
+    except ValueError: return None
+
+def http_post(url, data=None, headers=None, timeout=TIMEOUT):
+    r=_send("POST", url, data=data or {}, headers=headers, timeout=timeout)
+    try: return json_loads(r.content) if r is not None else None
+    except ValueError: return None
+
+# ---------- Conditional fetch ----------
+# catalogs and full ticker lists inside fetch_parsed(): ETag / Last-Modified revalidation, and a body digest so a
+# byte-identical payload skips json + parse and reuses what it parsed to last time (gzip is on for every session)
+FETCH_STATS = {}   # host -> {"wire": bytes received, "body": bytes decoded, "saved": bytes not sent (304), "304", "same", "parsed"}
+_VALIDATORS = {}   # url|params -> (etag, last_modified, digest, body size)
+_PARSED = {}       # fetch key -> last parsed result
+_val_lock = threading.Lock()
+
+class Unchanged(Exception):
+    # raised by http_get inside fetch_parsed when the payload is the one already parsed
+    pass
+
+def _fetch_st(host):
+    st=FETCH_STATS.get(host)
+    if st is None: st=FETCH_STATS[host]={"wire":0, "body":0, "saved":0, "304":0, "same":0, "parsed":0}
+    return st
+
+def _fetch_count(host, r):
+    n=len(r.content)
+    try: wire=int(r.headers.get("Content-Length") or n)
+    except ValueError: wire=n
+    with _val_lock:
+        st=_fetch_st(host); st["wire"]+=wire; st["body"]+=n
+
+def _get_memo(url, params, headers, timeout):
+    # signed query strings change every call: they key by path, the digest still tells equal payloads apart
+    key=url.split("?")[0]+"|"+urlparse.urlencode(sorted((params or {}).items()))
+    with _val_lock: v=_VALIDATORS.get(key) if _tl.memo else None   # nothing to reuse → plain GET
+    _tl.memo_keys.append(key)
+    h=dict(headers or {})
+    if v:
+        if v[0]: h["If-None-Match"]=v[0]
+        if v[1]: h["If-Modified-Since"]=v[1]
+    r=_send("GET", url, params=params or {}, headers=h, timeout=timeout)
+    if r is None:
+        with _val_lock: _VALIDATORS.pop(key, None)
+        return None
+    host=urlparse.urlsplit(url).hostname or ""
+    if r.status_code==304 and v:
+        with _val_lock: st=_fetch_st(host); st["304"]+=1; st["saved"]+=v[3]
+        raise Unchanged()
+    dg=hashlib.blake2b(r.content, digest_size=16).digest()
+    val=(r.headers.get("ETag"), r.headers.get("Last-Modified"), dg, len(r.content))
+    if v and v[2]==dg:
+        with _val_lock: _VALIDATORS[key]=val; _fetch_st(host)["same"]+=1
+        raise Unchanged()
+    with _val_lock: _fetch_st(host)["parsed"]+=1
+    try: j=json_loads(r.content)
+    except ValueError:
+        with _val_lock: _VALIDATORS.pop(key, None)   # never revalidate against a body that did not decode
+        return None
+    with _val_lock: _VALIDATORS[key]=val
+    return j
+
+def fetch_parsed(key, fn):
+    # -> (result, changed); fn fetches and parses. Unchanged payload → the previous result, unparsed.
+    # Only a non-empty result is kept; a failed or empty one drops the validators of every request fn made, so the
+    # next call is a full GET and a recovered venue can't be answered with Unchanged against the failure
+    prev=_PARSED.get(key, _PARSED)
+    _tl.memo=prev is not _PARSED   # False: first run, validators are only recorded
+    _tl.memo_keys=[]; out=None; changed=True
+    try: out=fn()
+    except Unchanged: out=prev; changed=False
+    finally:
+        _tl.memo=None
+        if changed and not out:
+            with _val_lock:
+                for k in _tl.memo_keys: _VALIDATORS.pop(k, None)
+    if changed and out: _PARSED[key]=out
+    return out, changed
+
+# symbol-filtered tickers: venues whose ticker endpoint takes a symbol list get only the symbols the last full
+# listing parsed into QUOTES (Kraken: the fiat pairs stay off the wire); full listing again every SYMBOL_FULL_EVERY
+SYMBOL_FILTER = {"kraken": "pair"}   # ex -> query parameter
+SYMBOL_FULL_EVERY = 900
+_SYMBOLS = {}   # ex -> (learned at, [venue symbols])
+
+def symbol_params(ex):
+    t, syms = _SYMBOLS.get(ex, (0, None))
+    if syms and time.time()-t<SYMBOL_FULL_EVERY: return {SYMBOL_FILTER[ex]: ",".join(syms)}
+    if syms: _SYMBOLS[ex]=(time.time(), syms)   # an identical full listing (Unchanged) keeps the list as is
+    return None
+
+def learn_symbols(ex, syms):
+    _SYMBOLS[ex]=(time.time(), sorted(syms))
+
+def fetch_stats():
+    with _val_lock: return {h:dict(st) for h,st in FETCH_STATS.items()}
+
+def now_ms(): return int(time.time()*1000)
+
+# ---------- Normalization ----------
+CHAIN_MAP = {
+    "ETHEREUM":"ERC20","ERC20":"ERC20","ETH":"ERC20",
+    "BEP20":"BEP20","BSC":"BEP20","BINANCE SMART CHAIN":"BEP20",
+    "TRON":"TRC20","TRC20":"TRC20","TRX":"TRC20",
+    "ARBITRUM":"ARB","ARBITRUM ONE":"ARB","ARB":"ARB",
+    "OPTIMISM":"OP","OP":"OP",
+    "MATIC":"POLYGON","POLYGON":"POLYGON","POL":"POLYGON",
+    "AVALANCHE":"AVAXC","AVAXC":"AVAXC","AVALANCHE C-CHAIN":"AVAXC",
+    "SOL":"SOL","SOLANA":"SOL",
+    "BASE":"BASE","TON":"TON","SUI":"SUI","APTOS":"APTOS",
+    "BTC":"BTC","BITCOIN":"BTC","LTC":"LTC","LITECOIN":"LTC"
+}
+def norm_chain(s: str)->Optional[str]:
+    if not s: return None
+    u = s.strip().upper()
+    if "-" in u: u = u.split("-")[-1]
+    return CHAIN_MAP.get(u, u)
+
+def norm_pairkey(s: str)->str:
+    return (s or "").upper().replace("-","").replace("_","")
+
+def same_contract(a: Optional[str], b: Optional[str])->bool:
+    if not a and not b: return True
+    if not a or not b: return False
+    return a.strip().lower()==b.strip().lower()
+
+# ---------- Signing ----------
+def sign_qs_sha256(params: dict, secret: str):
+    qs = urlparse.urlencode(params)
+    sig = hmac.new(secret.encode(), qs.encode(), hashlib.sha256).hexdigest()
+    return qs + "&signature=" + sig
+
+def sign_okx(method: str, path: str, body: str, ts: str, secret: str):
+    msg = (ts + method.upper() + path + (body or "")).encode()
+    mac = hmac.new(secret.encode(), msg, hashlib.sha256).digest()
+    return base64.b64encode(mac).decode()
+
+_kr_nonce=[0]; _kr_lock=threading.Lock()
+def kraken_nonce():
+    # strictly increasing even for two calls in the same millisecond (prefetch workers run side by side)
+    with _kr_lock:
+        _kr_nonce[0]=max(_kr_nonce[0]+1, now_ms()); return _kr_nonce[0]
+
+def kraken_private(path: str, data: dict, key: str, secret_b64: str):
+    # budget first, nonce after: a call that waited in GOV must not carry an older nonce than one sent meanwhile
+    if not GOV.acquire("kraken.private"): return None
+    nonce = str(kraken_nonce())
+    payload = dict(data or {}); payload["nonce"]=nonce
+    postdata = urlparse.urlencode(payload)
+    sha256 = hashlib.sha256((nonce+postdata).encode()).digest()
+    mac = hmac.new(base64.b64decode(secret_b64), path.encode()+sha256, hashlib.sha512)
+    headers = {"API-Key":key,"API-Sign":base64.b64encode(mac.digest()).decode(),"Content-Type":"application/x-www-form-urlencoded"}
+    url = "https://api.kraken.com"+path
+    r = _send("POST", url, "kraken.private", False, data=postdata, headers=headers)
+    try: j = json_loads(r.content) if r is not None else None
+    except ValueError: j = None
+    if not j: return None
+    err = j.get("error") or []
+    if err:
+        if METRICS.on: METRICS.count("kraken.errors")
+        if any("Rate limit" in e for e in err): GOV.penalize("kraken.private")   # counter overrun → back off
+        return None
+    return j.get("result")
+
+# ---------- Network caches ----------
+# متادیتای کیف‌پول: TTL برای هر اکسچنج، کش منفی با backoff، و stale-while-revalidate
+NET_TTL = {"binance":600, "okx":600, "mexc":600, "gate":900, "bitget":900, "xt":900, "bitmart":900, "htx":900}
+NET_TTL_DEFAULT = 900
+NET_NEG_BASE, NET_NEG_MAX = 30, 600
+LAZY_NETS = ("kraken",)   # per-asset: resolved ahead of the join by ASSETS, with a fetch time per asset
+# فایل کش روی دیسک: MAGIC | len(header) | header json {v, saved, ex:{ex:[off,len,ts]}, at:{ex:{asset:ts}}} | zlib(json) per exchange
+NET_DISK_MAGIC = b"NC1"
+NET_DISK_VERSION = 2
+NET_SAVE_DELAY = 5
+
+class NetCache:
+    def __init__(self):
+        self.store={}    # ex -> {asset: {chain: info}}
+        self.ts={}       # ex -> fetch time of store[ex]
+        self.ats={}      # per-asset exchanges: ex -> {asset: fetch time}
+        self.fails={}    # ex -> (consecutive failures, retry_at)
+        self.stats={"hit":0,"stale":0,"miss":0,"neg":0,"refresh":0,"fail":0,"disk":0}
+        self._lock=threading.Lock(); self._ex_locks={}; self._busy=set()
+        self.path=None; self._mm=None; self._disk={}; self._save_t=None
+        self.listeners=[]   # fn(ex, asset|None) on every change of store[ex]
+    def get(self,ex): return self.store.get(ex)
+    def set(self,ex,v):
+        self.store[ex]=v; self.ts[ex]=time.time(); self.fails.pop(ex, None)
+        self.touch(ex)
+    def lazy(self, ex):
+        # dict قابل‌تغییر برای اکسچنج‌های per-asset (Kraken)
+        self._from_disk(ex)
+        return self.store.setdefault(ex, {})
+    def set_asset(self, ex, asset, v):
+        self.lazy(ex)[asset]=v; self.ats.setdefault(ex, {})[asset]=time.time()
+        self.touch(ex, asset)
+    def stale_assets(self, ex, assets, ttl):
+        # assets never resolved or older than ttl; stale ones keep serving until the refresh lands
+        at=self.ats.get(ex, {}); now=time.time()
+        return [a for a in assets if now-at.get(a, 0)>=ttl]
+    def invalidate(self, ex=None):
+        # داده‌ی قدیمی تا رسیدن داده‌ی تازه سرو می‌شود
+        for e in ([ex] if ex else list(self.ts)): self.ts[e]=0
+        for e in ([ex] if ex else list(self._disk)):
+            if e in self._disk: self._disk[e]=self._disk[e][:2]+(0,)
+        for e in ([ex] if ex else list(self.fails)): self.fails.pop(e, None)
+        for e in LAZY_NETS:
+            if ex in (None, e):
+                self.store.pop(e, None); self._disk.pop(e, None); self.ats.pop(e, None)
+                for fn in self.listeners: fn(e, None)
+    def fetch(self, ex, keys):
+        self._from_disk(ex)
+        now=time.time(); data=self.store.get(ex)
+        if data:
+            if now-self.ts.get(ex,0) < NET_TTL.get(ex, NET_TTL_DEFAULT):
+                self.stats["hit"]+=1
+            else:
+                self.stats["stale"]+=1; self._refresh_bg(ex, keys)
+            return data
+        if ex in self.fails:
+            self.stats["neg"]+=1; self._refresh_bg(ex, keys)
+            return {}
+        self.stats["miss"]+=1
+        with self._ex_lock(ex):   # فقط یک fetch همزمان؛ بقیه منتظر نتیجه می‌مانند
+            if ex in self.store or ex in self.fails: return self.store.get(ex) or {}
+            return self._load(ex, keys)
+    def _ex_lock(self, ex):
+        with self._lock: return self._ex_locks.setdefault(ex, threading.Lock())
+    def _load(self, ex, keys):
+        fn=NET_FETCHERS.get(ex)
+        try: out, changed = fetch_parsed(("nets", ex), lambda: fn(keys)) if fn else ({}, True)
+        except Exception: out, changed = {}, True
+        out=out or {}
+        if out and not changed and out is self.store.get(ex):
+            # same catalog: only the clock moves, routes built on it stay valid
+            self.ts[ex]=time.time(); self.fails.pop(ex, None)
+        elif out: self.set(ex, out)
+        else:
+            n=self.fails.get(ex, (0,0))[0]+1
+            self.fails[ex]=(n, time.time()+min(NET_NEG_MAX, NET_NEG_BASE*2**(n-1)))
+            self.stats["fail"]+=1
+        return out
+    def _refresh_bg(self, ex, keys):
+        f=self.fails.get(ex)
+        if f and time.time()<f[1]: return
+        with self._lock:
+            if ex in self._busy: return
+            self._busy.add(ex)
+        def run():
+            try:
+                self._load(ex, keys); self.stats["refresh"]+=1
+            finally:
+                with self._lock: self._busy.discard(ex)
+        threading.Thread(target=run, daemon=True).start()
+    # --- persistence ---
+    def attach(self, path):
+        # فقط header خوانده می‌شود؛ هر اکسچنج در اولین دسترسی از mmap باز می‌شود
+        self.path=path
+        try:
+            with open(path,"rb") as f: mm=mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            if mm[:3]!=NET_DISK_MAGIC: raise ValueError("bad file")
+            (hl,)=struct.unpack(">I", mm[3:7])
+            hdr=json.loads(mm[7:7+hl])
+            if hdr.get("v")!=NET_DISK_VERSION: raise ValueError("version")
+            self._mm=mm; self._disk={ex:(7+hl+o, n, ts) for ex,(o,n,ts) in hdr["ex"].items()}
+            self.ats={ex:dict(at) for ex,at in hdr.get("at", {}).items()}
+        except Exception:
+            self._disk={}
+    def _from_disk(self, ex):
+        if ex not in self._disk: return
+        with self._lock: d=self._disk.pop(ex, None)
+        if not d or ex in self.store: return
+        o,n,ts=d
+        try:
+            self.store[ex]=json.loads(zlib.decompress(self._mm[o:o+n]))
+            if ex not in LAZY_NETS: self.ts[ex]=ts
+            self.stats["disk"]+=1
+        except Exception: pass
+    def touch(self, ex, asset=None):
+        for fn in self.listeners: fn(ex, asset)
+        # ذخیره‌ی با تأخیر تا چند refresh پشت‌سرهم یک بار نوشته شوند
+        if not self.path: return
+        with self._lock:
+            if self._save_t: return
+            self._save_t=threading.Timer(NET_SAVE_DELAY, self._save_bg); self._save_t.daemon=True; self._save_t.start()
+    def _save_bg(self):
+        with self._lock: self._save_t=None
+        self.save()
+    def save(self):
+        if not self.path: return False
+        try: self._write()
+        except Exception: return False
+        return True
+    def _write(self):
+        blobs={}
+        for ex,data in list(self.store.items()):
+            if not data: continue
+            raw=json.dumps(dict(data), separators=(",",":")).encode()
+            blobs[ex]=(zlib.compress(raw, 6), self.ts.get(ex, time.time()))
+        for ex,(o,n,ts) in list(self._disk.items()):
+            if ex not in blobs: blobs[ex]=(self._mm[o:o+n], ts)
+        hdr={"v":NET_DISK_VERSION, "saved":time.time(), "ex":{}, "at":{ex:dict(at) for ex,at in list(self.ats.items())}}; off=0
+        for ex,(b,ts) in blobs.items():
+            hdr["ex"][ex]=[off, len(b), ts]; off+=len(b)
+        h=json.dumps(hdr, separators=(",",":")).encode()
+        tmp=self.path+".tmp"
+        with open(tmp,"wb") as f:
+            f.write(NET_DISK_MAGIC+struct.pack(">I", len(h))+h)
+            for b,_ in blobs.values(): f.write(b)
+        os.replace(tmp, self.path)
+NET = NetCache()
+
+# ---------- Networks per exchange ----------
+def nets_binance(keys):
+    k, s = keys.get("api_key"), keys.get("secret")
+    if not (k and s): return {}
+    params={"timestamp":now_ms(),"recvWindow":5000}
+    qs = sign_qs_sha256(params, s)
+    url = "https://api.binance.com/sapi/v1/capital/config/getall?"+qs
+    j = http_get(url, headers={"X-MBX-APIKEY":k}) or []
+    out={}
+    for c in j:
+        sym = (c.get("coin") or "").upper()
+        nm  = c.get("name") or sym
+        for ch in c.get("networkList") or []:
+            n = norm_chain(ch.get("network") or ch.get("name"))
+            if not n: continue
+            out.setdefault(sym,{})[n]={
+                "can_dep": bool(ch.get("depositEnable")),
+                "can_wd":  bool(ch.get("withdrawEnable")),
+                "wd_fee":  float(ch.get("withdrawFee") or 0.0),
+                "min_wd":  float(ch.get("withdrawMin") or 0.0),
+                "min_dep": float(ch.get("depositMin") or 0.0),
+                "contract": (ch.get("contractAddress") or None),
+                "name": nm
+            }
+    return out
+
+def nets_okx(keys):
+    # عمومی کفایت می‌کند؛ ولی بدون کلید، این اکسچنج وارد اسکن نمی‌شود (gating)
+    j = http_get("https://www.okx.com/api/v5/asset/currencies") or {}
+    out={}
+    for c in j.get("data",[]):
+        sym = (c.get("ccy") or "").upper()
+        ch  = norm_chain(c.get("chain") or "")
+        if not ch: continue
+        out.setdefault(sym,{})[ch]={
+            "can_dep": (str(c.get("canDep")).lower() in ("1","true")),
+            "can_wd":  (str(c.get("canWd")).lower() in ("1","true")),
+            "wd_fee":  float(c.get("minFee") or c.get("fee") or 0.0),
+            "min_wd":  float(c.get("minWd") or 0.0),
+            "min_dep": float(c.get("minDep") or 0.0),
+            "contract": (c.get("contractAddr") or None),
+            "name": c.get("name") or sym
+        }
+    return out
+
+def nets_gate(keys):
+    j = http_get("https://api.gateio.ws/api/v4/spot/currencies", headers={"Accept":"application/json"}) or []
+    out={}
+    for c in j:
+        sym = (c.get("currency") or "").upper()
+        nm  = c.get("name") or sym
+        for ch in c.get("chains") or []:
+            n = norm_chain(ch.get("chain") or ch.get("name"))
+            if not n: continue
+            out.setdefault(sym,{})[n]={
+                "can_dep": not bool(ch.get("deposit_disabled") or ch.get("deposit_disabled_notice")),
+                "can_wd":  not bool(ch.get("withdraw_disabled") or ch.get("withdraw_disabled_notice")),
+                "wd_fee":  float(ch.get("withdraw_fix_on_chain_fee") or ch.get("withdraw_fee") or 0),
+                "min_wd":  float(ch.get("withdraw_min") or 0),
+                "min_dep": float(ch.get("deposit_min") or 0),
+                "contract": (ch.get("contract_address") or None),
+                "name": nm
+            }
+    return out
+
+def nets_mexc(keys):
+    k, s = keys.get("api_key"), keys.get("secret")
+    if not (k and s): return {}
+    params={"timestamp":now_ms(),"recvWindow":5000}
+    qs = sign_qs_sha256(params, s)
+    url = "https://api.mexc.com/api/v3/capital/config/getall?"+qs
+    j = http_get(url, headers={"X-MEXC-APIKEY":k}) or []
+    out={}
+    for c in j:
+        sym=(c.get("coin") or "").upper()
+        nm=c.get("name") or sym
+        for ch in c.get("networkList") or []:
+            n = norm_chain(ch.get("network") or "")
+            if not n: continue
+            out.setdefault(sym,{})[n]={
+                "can_dep": bool(ch.get("depositEnable")),
+                "can_wd":  bool(ch.get("withdrawEnable")),
+                "wd_fee":  float(ch.get("withdrawFee") or 0),
+                "min_wd":  float(ch.get("withdrawMin") or 0),
+                "min_dep": float(ch.get("depositMin") or 0),
+                "contract": (ch.get("contractAddress") or None),
+                "name": nm
+            }
+    return out
+
+def nets_bitget(keys):
+    j = http_get("https://api.bitget.com/api/spot/v1/public/currencies") or {}
+    out={}
+    for c in j.get("data",[]) or []:
+        sym=(c.get("coinName") or c.get("symbol") or "").upper()
+        nm = c.get("name") or sym
+        for ch in c.get("chains") or []:
+            n = norm_chain(ch.get("chain") or "")
+            if not n: continue
+            out.setdefault(sym,{})[n]={
+                "can_dep": str(ch.get("rechargeable")).lower() in ("true","1"),
+                "can_wd":  str(ch.get("withdrawable")).lower() in ("true","1"),
+                "wd_fee":  float(ch.get("withdrawFee") or 0),
+                "min_wd":  float(ch.get("withdrawMin") or 0),
+                "min_dep": float(ch.get("rechargeMin") or 0),
+                "contract": (ch.get("contractAddress") or None),
+                "name": nm
+            }
+    return out
+
+def nets_xt(keys):
+    j = http_get("https://sapi.xt.com/v4/public/wallet/support/currency") or {}
+    out={}
+    for c in j.get("result") or []:
+        sym=(c.get("currency") or "").upper()
+        nm = c.get("name") or sym
+        for ch in c.get("chains") or []:
+            n = norm_chain(ch.get("chain") or "")
+            if not n: continue
+            out.setdefault(sym,{})[n]={
+                "can_dep": not bool(ch.get("depositDisabled")),
+                "can_wd":  not bool(ch.get("withdrawDisabled")),
+                "wd_fee":  float(ch.get("withdrawFee") or 0),
+                "min_wd":  float(ch.get("withdrawMin") or 0),
+                "min_dep": float(ch.get("depositMin") or 0),
+                "contract": (ch.get("contractAddress") or None),
+                "name": nm
+            }
+    return out
+
+def nets_bitmart(keys):
+    j = http_get("https://api-cloud.bitmart.com/spot/v1/currencies") or {}
+    out={}
+    for c in j.get("data",{}).get("currencies",[]):
+        sym=(c.get("currency") or "").upper()
+        nm = c.get("name") or sym
+        for ch in c.get("chains") or []:
+            n = norm_chain(ch.get("chain") or "")
+            if not n: continue
+            out.setdefault(sym,{})[n]={
+                "can_dep": bool(ch.get("deposit_enabled")),
+                "can_wd":  bool(ch.get("withdraw_enabled")),
+                "wd_fee":  float(ch.get("withdraw_fee") or 0),
+                "min_wd":  float(ch.get("withdraw_min") or 0),
+                "min_dep": float(ch.get("deposit_min") or 0),
+                "contract": (ch.get("contract_address") or None),
+                "name": nm
+            }
+    return out
+
+def nets_htx(keys):
+    j = http_get("https://api.huobi.pro/v2/reference/currencies") or {}
+    out={}
+    for c in j.get("data",[]) or []:
+        sym=(c.get("currency") or "").upper()
+        nm = c.get("display-name") or sym
+        for ch in c.get("chains") or []:
+            n = norm_chain(ch.get("chain") or "")
+            if not n: continue
+            out.setdefault(sym,{})[n]={
+                "can_dep": (ch.get("depositStatus")=="allowed"),
+                "can_wd":  (ch.get("withdrawStatus")=="allowed"),
+                "wd_fee":  float(ch.get("transactFeeWithdraw") or 0),
+                "min_wd":  float(ch.get("minWithdrawAmt") or 0),
+                "min_dep": float(ch.get("minDepositAmt") or 0),
+                "contract": (ch.get("contractAddr") or None),
+                "name": nm
+            }
+    return out
+
+def nets_kraken(keys):
+    # per-asset, با ASSETS پر می‌شود
+    return {}
+
+def kraken_asset(asset, keys):
+    # {chain: info} for one asset, {} if Kraken has no method for it, None if a call failed (retried later)
+    k, s_b64 = keys.get("api_key"), keys.get("secret")
+    if not (k and s_b64): return None
+    deps = kraken_private("/0/private/DepositMethods", {"asset": asset}, k, s_b64)
+    if deps is None: return None
+    wds  = kraken_private("/0/private/WithdrawMethods", {"asset": asset}, k, s_b64)
+    if wds is None: return None
+    dep = {norm_chain(d.get("method")): True for d in deps}
+    wd  = {norm_chain(w.get("method")): True for w in wds}
+    res={}
+    for ch in set(list(dep.keys())+list(wd.keys())):
+        if not ch: continue
+        res[ch]={
+            "can_dep": dep.get(ch, False),
+            "can_wd":  wd.get(ch, False),
+            "wd_fee":  0.0,
+            "min_wd":  0.0,
+            "min_dep": 0.0,
+            "contract": None,
+            "name": asset
+        }
+    return res
+
+def nets_bitrue(keys):
+    # شبکه‌ها ممکنه پایدار نباشند
+    return {}
+
+NET_FETCHERS = {
+    "binance": nets_binance, "okx": nets_okx, "gate": nets_gate, "mexc": nets_mexc,
+    "bitget": nets_bitget, "xt": nets_xt, "bitmart": nets_bitmart, "htx": nets_htx,
+    "kraken": nets_kraken, "bitrue": nets_bitrue
+}
+
+# ---------- Per-asset wallets ----------
+# Kraken has no all-currencies endpoint: two signed calls per asset against its private-API counter.
+# Assets are resolved in the background ahead of the join, never inside it.
+ASSET_TTL = 6*3600
+ASSET_RETRY = 300      # s before a failed asset is tried again
+ASSET_WORKERS = 2
+ASSET_IDLE = 30        # s a worker waits for work before it exits
+
+ASSET_FETCHERS = {"kraken": kraken_asset}   # ex -> fn(asset, keys); calls are paced by GOV ("kraken.private")
+
+class AssetPrefetch:
+    # priority queue of (ex, asset) to resolve: assets in this scan's candidates first, then the rest of the overlap;
+    # a small pool drains it (paced by GOV) and stores results in NET with their fetch time
+    def __init__(self):
+        self._heap=[]; self._queued={}; self._busy=set(); self._seq=0
+        self._cv=threading.Condition(); self._workers=[]
+        self.retry={}   # (ex, asset) -> retry time after a failed lookup
+        self.stats={"queued":0, "fetched":0, "failed":0}
+    def want(self, ex, assets, api_keys, first=()):
+        # queue assets that are missing or past ASSET_TTL -> number newly queued (or moved up)
+        if ex not in ASSET_FETCHERS: return 0
+        now=time.time(); n=0
+        with self._cv:
+            for a in NET.stale_assets(ex, assets, ASSET_TTL):
+                k=(ex, a); p=0 if a in first else 1
+                if k in self._busy or self.retry.get(k, 0)>now or self._queued.get(k, 2)<=p: continue
+                self._queued[k]=p; self._seq+=1; n+=1
+                heapq.heappush(self._heap, (p, self._seq, ex, a, api_keys.get(ex, {})))
+            if n:
+                self.stats["queued"]+=n; self._spawn(); self._cv.notify_all()
+        return n
+    def pending(self, ex=None):
+        with self._cv: return sum(1 for k in list(self._queued)+list(self._busy) if ex in (None, k[0]))
+    def drain(self, timeout=None):
+        with self._cv: return self._cv.wait_for(lambda: not self._queued and not self._busy, timeout)
+    def _spawn(self):
+        self._workers=[t for t in self._workers if t.is_alive()]
+        while len(self._workers)<ASSET_WORKERS:
+            t=threading.Thread(target=self._run, name="assets", daemon=True); t.start(); self._workers.append(t)
+    def _next(self):
+        with self._cv:
+            while True:
+                while not self._heap:
+                    if not self._cv.wait(ASSET_IDLE) and not self._heap: return None
+                p, _, ex, a, keys = heapq.heappop(self._heap)
+                k=(ex, a)
+                if self._queued.get(k)!=p: continue   # superseded by a higher-priority entry
+                del self._queued[k]; self._busy.add(k)
+                return ex, a, keys
+    def _run(self):
+        while True:
+            job=self._next()
+            if job is None: return
+            ex, a, keys = job
+            try: res=ASSET_FETCHERS[ex](a, keys)
+            except Exception: res=None
+            if res is None:
+                self.retry[(ex, a)]=time.time()+ASSET_RETRY; self.stats["failed"]+=1
+            else:
+                NET.set_asset(ex, a, res); self.stats["fetched"]+=1
+            with self._cv:
+                self._busy.discard((ex, a)); self._cv.notify_all()
+ASSETS = AssetPrefetch()
+
+def overlap_assets(ex, books):
+    # bases ex lists that at least one other venue in this snapshot lists too
+    own={k[0] for k in books.get(ex, ())}
+    others=set()
+    for e, b in books.items():
+        if e!=ex: others.update(k[0] for k in b)
+    return own&others
+
+# ---------- Tickers ----------
+# one shared parse: venue symbol -> (base, quote) is worked out once per exchange and then looked up; symbols outside
+# QUOTES map to None and are skipped before anything is allocated. Delimited symbols (BTC-USDT, btc_usdt) split on
+# the venue's own separator, the rest by quote suffix
+_SYMMAP = {}   # ex -> {venue symbol: (base, quote) | None}
+_NOSYM = object()
+
+def split_symbol(s):
+    s=(s or "").upper()
+    for d in "-_":
+        if d in s:
+            base, _, q = s.rpartition(d)
+            base=base.replace("-","").replace("_","")
+            return (base, q) if base and q in QUOTES else None
+    for q in QUOTES:
+        if s.endswith(q) and len(s)>len(q): return (s[:-len(q)], q)
+    return None
+
+# every quote: {"bid", "ask", "ts", "vts", "quality"}; ts = when it was last confirmed here (receive time), vts = the
+# venue's own time in ms where it sends one, quality = QUOTE_BOOK (top of book) or QUOTE_LAST (a last trade for both sides)
+QUOTE_BOOK, QUOTE_LAST = "book", "last"
+
+def _ms(x):
+    try: return int(float(x)) or None
+    except (TypeError, ValueError): return None
+
+def parse_rows(ex, rows, sym, bid, ask, vts=None, tv=None):
+    # [{sym, bid, ask, ...}] -> {(base, quote): quote}; venue time from each row's vts field, or tv for the whole payload
+    m=_SYMMAP.setdefault(ex, {}); out={}; ts=time.time()
+    for it in rows:
+        s=it.get(sym)
+        k=m.get(s, _NOSYM)
+        if k is _NOSYM: k=m[s]=split_symbol(s)
+        if k is not None:
+            out[k]={"bid": float(it.get(bid) or 0), "ask": float(it.get(ask) or 0), "ts": ts,
+                    "vts": _ms(it.get(vts)) if vts else tv, "quality": QUOTE_BOOK}
+    return out
+
+def tickers_binance():
+    j = http_get("https://api.binance.com/api/v3/ticker/bookTicker") or []
+    return parse_rows("binance", j, "symbol", "bidPrice", "askPrice")
+
+def tickers_okx():
+    j = http_get("https://www.okx.com/api/v5/market/tickers", params={"instType":"SPOT"}) or {}
+    return parse_rows("okx", j.get("data") or [], "instId", "bidPx", "askPx", "ts")
+
+def tickers_gate():
+    j = http_get("https://api.gateio.ws/api/v4/spot/tickers", headers={"Accept":"application/json"}) or []
+    return parse_rows("gate", j, "currency_pair", "highest_bid", "lowest_ask")
+
+def tickers_mexc():
+    j = http_get("https://api.mexc.com/api/v3/ticker/bookTicker") or []
+    return parse_rows("mexc", j, "symbol", "bidPrice", "askPrice")
+
+def tickers_bitget():
+    j = http_get("https://api.bitget.com/api/v2/spot/market/tickers") or {}
+    return parse_rows("bitget", j.get("data") or [], "symbol", "bidPr", "askPr", "ts")
+
+def tickers_xt():
+    j = http_get("https://sapi.xt.com/v4/public/ticker") or {}
+    return parse_rows("xt", j.get("result") or [], "s", "bp", "ap", "t")
+
+def tickers_bitmart():
+    j = http_get("https://api-cloud.bitmart.com/spot/quotation/v3/tickers") or {}
+    return parse_rows("bitmart", (j.get("data") or {}).get("tickers") or [], "symbol", "best_bid", "best_ask")
+
+def tickers_htx():
+    j = http_get("https://api.huobi.pro/market/tickers") or {}
+    return parse_rows("htx", j.get("data") or [], "symbol", "bid", "ask", tv=_ms(j.get("ts")))
+
+def tickers_kraken():
+    url = "https://api.kraken.com/0/public/Ticker"
+    params = symbol_params("kraken")
+    j = http_get(url, params=params) or {}
+    if params and (j.get("error") or not j.get("result")):   # a listed pair went away → whole request fails
+        _SYMBOLS.pop("kraken", None); params = None
+        j = http_get(url) or {}
+    m=_SYMMAP.setdefault("kraken", {}); out={}; used=[]; ts=time.time()
+    for pair, it in (j.get("result") or {}).items():
+        k=m.get(pair, _NOSYM)
+        if k is _NOSYM: k=m[pair]=split_symbol(pair)
+        if k is None: continue
+        out[k]={"bid": float((it.get("b") or [0])[0]), "ask": float((it.get("a") or [0])[0]),   # [price, whole lot volume, lot volume]
+                "ts": ts, "vts": None, "quality": QUOTE_BOOK}
+        used.append(pair)
+    if not params and used: learn_symbols("kraken", used)
+    return out
+
+def tickers_bitrue():
+    # 24hr rows carry bid/ask on most symbols; where they are missing the last trade stands in for both (QUOTE_LAST)
+    j = http_get("https://openapi.bitrue.com/api/v1/ticker/24hr") or []
+    m=_SYMMAP.setdefault("bitrue", {}); out={}; ts=time.time()
+    for it in j:
+        s=it.get("symbol")
+        k=m.get(s, _NOSYM)
+        if k is _NOSYM: k=m[s]=split_symbol(s)
+        if k is None: continue
+        bid, ask = float(it.get("bidPrice") or 0), float(it.get("askPrice") or 0)
+        if bid>0 and ask>0: out[k]={"bid": bid, "ask": ask, "ts": ts, "vts": _ms(it.get("closeTime")), "quality": QUOTE_BOOK}
+        else:
+            p=float(it.get("lastPrice") or 0)
+            if p>0: out[k]={"bid": p, "ask": p, "ts": ts, "vts": _ms(it.get("closeTime")), "quality": QUOTE_LAST}
+    return out
+
+TICKERS = {
+    "binance": tickers_binance, "okx": tickers_okx, "gate": tickers_gate, "mexc": tickers_mexc,
+    "bitget": tickers_bitget, "xt": tickers_xt, "bitmart": tickers_bitmart, "htx": tickers_htx,
+    "kraken": tickers_kraken, "bitrue": tickers_bitrue
+}
+
+def ticker_book(ex):
+    # TICKERS[ex] through fetch_parsed; an unchanged payload confirms the same quotes again, so they take its receive time
+    book, changed = fetch_parsed(("tickers", ex), TICKERS[ex])
+    if book and not changed:
+        ts=time.time()
+        for p in book.values(): p["ts"]=ts
+    return book or {}
+
+# ---------- Concurrent ticker fetch ----------
+SCAN_DEADLINE = 10          # کل مرحله‌ی تیکر (ثانیه)
+TICKER_DEADLINE = {}        # override per exchange, e.g. {"htx":6}
+TICKER_DEADLINE_DEFAULT = 8
+# دو برابر تعداد اکسچنج‌ها تا درخواستِ جامانده از اسکن قبلی صف را نبندد
+_TICK_POOL = ThreadPoolExecutor(max_workers=2*len(TICKERS), thread_name_prefix="tickers")
+
+def _timed_tickers(ex):
+    t0=time.perf_counter(); _tl.http=0.0
+    try:
+        with priority(PRIO_TICKER): book=ticker_book(ex)
+    except Exception: book={}
+    el=time.perf_counter()-t0
+    if METRICS.on:
+        METRICS.time(f"fetch.{ex}", _tl.http); METRICS.time(f"parse.{ex}", el-_tl.http)
+    return book, el
+
+def fetch_books(exchanges, deadline=SCAN_DEADLINE):
+    # returns (books, lat); lat[ex] is seconds, or None if the exchange missed its deadline
+    t0=time.perf_counter()
+    futs={_TICK_POOL.submit(_timed_tickers, ex): ex for ex in exchanges}
+    due={f: min(deadline, TICKER_DEADLINE.get(ex, TICKER_DEADLINE_DEFAULT)) for f,ex in futs.items()}
+    books={ex:{} for ex in exchanges}; lat={}
+    pending=set(futs)
+    while pending:
+        el=time.perf_counter()-t0
+        for f in [f for f in pending if el>=due[f]]:
+            pending.discard(f); lat[futs[f]]=None   # partial: بقیه‌ی دفترها برمی‌گردند
+        if not pending: break
+        done,_=wait(pending, timeout=min(due[f] for f in pending)-el, return_when=FIRST_COMPLETED)
+        for f in done:
+            pending.discard(f); books[futs[f]], lat[futs[f]] = f.result()
+    return books, lat
+
+# ---------- Streaming top-of-book ----------
+# یک WebSocket برای هر اکسچنج → LIVE؛ اسنپ‌شات REST در شروع/اتصال مجدد، و poll با REST وقتی WS نداریم
+WS_TIMEOUT = 5          # recv timeout; ping و بررسی قطعی در همین فاصله
+WS_STALE = 60           # بدون پیام → اتصال مجدد
+WS_BACKOFF_MIN, WS_BACKOFF_MAX = 2, 120
+WS_MAX_SUBS = 800
+REST_POLL = 15          # fallback poll interval
+LIVE_MAX_AGE = 30       # scan_real از LIVE فقط وقتی تازه‌تر از این است می‌خواند
+
+class QuoteStore:
+    # ex -> {(base, quote): quote} (see parse_rows); ts = local receive time, vts = venue time (ms) if sent
+    def __init__(self):
+        self.books={}; self.seen={}; self.listeners=[]   # fn(ex, key|None)
+        self._lock=threading.Lock()
+    def put(self, ex, key, bid, ask, ts=None, vts=None):
+        ts=ts or time.time()
+        with self._lock:
+            self.books.setdefault(ex, {})[key]={"bid":bid, "ask":ask, "ts":ts, "vts":vts, "quality":QUOTE_BOOK}
+            self.seen[ex]=ts
+        for fn in self.listeners: fn(ex, key)
+    def load(self, ex, book, ts=None):
+        ts=ts or time.time()
+        with self._lock:
+            self.books[ex]={k:dict(v, ts=ts) for k,v in book.items()}
+            self.seen[ex]=ts
+        for fn in self.listeners: fn(ex, None)
+    def snapshot(self, ex):
+        # quotes are replaced, never mutated, so a shallow copy is a consistent view
+        with self._lock: return dict(self.books.get(ex, {}))
+    def age(self, ex):
+        return time.time()-self.seen.get(ex, 0)
+    def clear(self, ex=None):
+        with self._lock:
+            for e in ([ex] if ex else list(self.books)): self.books.pop(e, None); self.seen.pop(e, None)
+LIVE = QuoteStore()
+
+def _chunks(xs, n): return [xs[i:i+n] for i in range(0, len(xs), n)]
+
+def _ws_binance_parse(m):
+    if "s" in m and "b" in m: yield m["s"], float(m["b"]), float(m["a"]), None
+
+def _ws_okx_parse(m):
+    for d in m.get("data") or []: yield d.get("instId",""), float(d.get("bidPx") or 0), float(d.get("askPx") or 0), int(d.get("ts") or 0) or None
+
+def _ws_gate_parse(m):
+    if m.get("channel")=="spot.book_ticker" and m.get("event")=="update":
+        r=m.get("result") or {}
+        yield r.get("s",""), float(r.get("b") or 0), float(r.get("a") or 0), r.get("t")
+
+def _ws_bitget_parse(m):
+    for d in m.get("data") or []: yield d.get("instId",""), float(d.get("bidPr") or 0), float(d.get("askPr") or 0), int(d.get("ts") or 0) or None
+
+def _ws_htx_parse(m):
+    t=m.get("tick")
+    if t: yield t.get("symbol",""), float(t.get("bid") or 0), float(t.get("ask") or 0), m.get("ts")
+
+WS_SPECS = {
+    "binance": {"url":"wss://stream.binance.com:9443/ws", "fmt":lambda b,q: f"{b}{q}", "pace":0.25, "parse":_ws_binance_parse,
+                "subs":lambda ss: [json.dumps({"method":"SUBSCRIBE","params":[s.lower()+"@bookTicker" for s in c],"id":i+1}) for i,c in enumerate(_chunks(ss,200))]},
+    "okx":     {"url":"wss://ws.okx.com:8443/ws/v5/public", "fmt":lambda b,q: f"{b}-{q}", "ping":"ping", "parse":_ws_okx_parse,
+                "subs":lambda ss: [json.dumps({"op":"subscribe","args":[{"channel":"tickers","instId":s} for s in c]}) for c in _chunks(ss,100)]},
+    "gate":    {"url":"wss://api.gateio.ws/ws/v4/", "fmt":lambda b,q: f"{b}_{q}", "parse":_ws_gate_parse,
+                "subs":lambda ss: [json.dumps({"time":int(time.time()),"channel":"spot.book_ticker","event":"subscribe","payload":c}) for c in _chunks(ss,100)]},
+    "bitget":  {"url":"wss://ws.bitget.com/v2/ws/public", "fmt":lambda b,q: f"{b}{q}", "ping":"ping", "pace":0.1, "parse":_ws_bitget_parse,
+                "subs":lambda ss: [json.dumps({"op":"subscribe","args":[{"instType":"SPOT","channel":"ticker","instId":s} for s in c]}) for c in _chunks(ss,50)]},
+    "htx":     {"url":"wss://api.huobi.pro/ws", "fmt":lambda b,q: f"{b}{q}".lower(), "gzip":True, "pace":0.01, "parse":_ws_htx_parse,
+                "reply":lambda m: json.dumps({"pong":m["ping"]}) if "ping" in m else None,
+                "subs":lambda ss: [json.dumps({"sub":f"market.{s}.bbo","id":s}) for s in ss]},
+    # mexc (protobuf), xt, bitmart, kraken, bitrue: فعلاً فقط REST poll
+}
+
+def load_websocket():
+    # deferred so the headless scanner and one-shot scans don't pay for it at import
+    global websocket
+    if websocket is None:
+        try: import websocket as ws
+        except ImportError: return None
+        websocket = ws
+    return websocket
+
+class WSFeed:
+    def __init__(self, ex, keys, store=None, url=None, snapshot=True, record=None):
+        self.ex=ex; self.spec=WS_SPECS.get(ex) or {}; self.store=store or LIVE
+        self.url=url or self.spec.get("url")
+        fmt=self.spec.get("fmt") or (lambda b,q: b+q)
+        self.symbols=[fmt(b,q) for b,q in keys]
+        self.map={norm_pairkey(fmt(b,q)):(b,q) for b,q in keys}
+        self.keys=set(keys); self.alive=0.0   # last message on an open stream
+        self.state="idle"; self.msgs=0; self.reconnects=0
+        self._snap=snapshot; self._rec=record; self._ws=None
+        self._stop=threading.Event()
+    def start(self):
+        threading.Thread(target=self._run, daemon=True, name=f"ws-{self.ex}").start(); return self
+    def stop(self):
+        self._stop.set()
+        try:
+            if self._ws: self._ws.close()
+        except Exception: pass
+    def _snapshot(self):
+        try:
+            with priority(PRIO_TICKER): book=ticker_book(self.ex)
+        except Exception: book={}
+        if book: self.store.load(self.ex, book)
+    def _run(self):
+        delay=WS_BACKOFF_MIN
+        while not self._stop.is_set():
+            if self._snap: self._snapshot()
+            self._snap=True   # هر اتصال مجدد با اسنپ‌شات تازه شروع می‌شود
+            if load_websocket() is None or not self.url:
+                self.state="rest"; self._stop.wait(REST_POLL); continue
+            try:
+                self.state="connecting"
+                self._ws=ws=websocket.create_connection(self.url, timeout=WS_TIMEOUT)
+                for m in self.spec.get("subs", lambda ss: [])(self.symbols):
+                    ws.send(m)
+                    if self.spec.get("pace"): time.sleep(self.spec["pace"])
+                self.state="live"; delay=WS_BACKOFF_MIN
+                last=last_ping=time.time()
+                while not self._stop.is_set():
+                    try: raw=ws.recv()
+                    except websocket.WebSocketTimeoutException: raw=None
+                    now=time.time()
+                    if raw:
+                        last=self.alive=now; self._handle(raw, now)
+                    elif now-last>WS_STALE: break
+                    if self.spec.get("ping") and now-last_ping>=WS_TIMEOUT*4:
+                        ws.send(self.spec["ping"]); last_ping=now
+            except Exception: pass
+            finally:
+                try: self._ws and self._ws.close()
+                except Exception: pass
+                self._ws=None
+            if self._stop.is_set(): break
+            self.state="backoff"; self.reconnects+=1
+            self._stop.wait(delay); delay=min(WS_BACKOFF_MAX, delay*2)
+        self.state="stopped"
+    def _handle(self, raw, now):
+        if self._rec: self._rec(self.ex, raw, now)
+        if isinstance(raw, bytes) and self.spec.get("gzip"): raw=gzip.decompress(raw)
+        try: m=json.loads(raw)
+        except ValueError: return   # "pong" و پیام‌های متنی
+        if not isinstance(m, dict): return
+        rep=self.spec.get("reply") and self.spec["reply"](m)
+        if rep:
+            self._ws.send(rep); return
+        self.msgs+=1
+        for sym, bid, ask, vts in self.spec["parse"](m):
+            k=self.map.get(norm_pairkey(sym))
+            if k and bid>0 and ask>0: self.store.put(self.ex, k, bid, ask, now, vts)
+
+class LiveFeeds:
+    def __init__(self, store=None):
+        self.store=store or LIVE; self.feeds={}; self._lock=threading.Lock()
+    def start(self, exchanges, quotes, record=None):
+        # blocking (REST snapshots); فقط نمادهایی که حداقل در دو اکسچنج هستند subscribe می‌شوند
+        self.stop()
+        books,_=fetch_books(list(exchanges))
+        cnt={}   # listings per base over every quote (cross-quote pairs count too)
+        for b in books.values():
+            for k in b:
+                if k[1] in quotes: cnt[k[0]]=cnt.get(k[0],0)+1
+        feeds={}
+        for ex, b in books.items():
+            if b: self.store.load(ex, b)
+            keys=sorted((k for k in b if k[1] in quotes and cnt.get(k[0],0)>=2), key=lambda k: -cnt[k[0]])[:WS_MAX_SUBS]
+            feeds[ex]=WSFeed(ex, keys, self.store, snapshot=not b, record=record).start()
+        with self._lock: self.feeds=feeds
+    def stop(self):
+        with self._lock: feeds, self.feeds = self.feeds, {}
+        for f in feeds.values(): f.stop()
+        for ex in feeds: self.store.clear(ex)
+    def book(self, ex, max_age=LIVE_MAX_AGE):
+        # None → caller should fall back to REST. A subscribed quote on a live stream is current as of the stream's last
+        # message (book tickers only push changes); the rest are as old as the snapshot or poll that loaded them
+        f=self.feeds.get(ex)
+        if not f or self.store.age(ex)>max_age: return None
+        b=self.store.snapshot(ex)
+        if f.state=="live" and f.alive:
+            for k in f.keys & b.keys():
+                if b[k]["ts"]<f.alive: b[k]=dict(b[k], ts=f.alive)
+        return b
+    def status(self):
+        return {ex:f.state for ex,f in self.feeds.items()}
+FEEDS = LiveFeeds(LIVE)
+
+TAKER_FEE = {
+    "binance":0.0010,"okx":0.0010,"gate":0.0020,"mexc":0.0020,"bitget":0.0010,
+    "xt":0.0020,"bitmart":0.0025,"htx":0.0020,"kraken":0.0026,"bitrue":0.0010
+}
+
+# ---------- Secure key storage (AES-CTR + HMAC) ----------
+MAGIC=b"AK1"
+def derive(pin:str, salt:bytes):
+    dk = hashlib.pbkdf2_hmac("sha256", pin.encode(), salt, 200_000, dklen=64)
+    return dk[:32], dk[32:]
+
+def enc_json(obj:dict, pin:str)->bytes:
+    raw = json.dumps(obj, ensure_ascii=False).encode()
+    salt = secrets.token_bytes(16); iv = secrets.token_bytes(16)
+    ek, mk = derive(pin, salt)
+    ctr = pyaes.Counter(int.from_bytes(iv,"big"))
+    aes = pyaes.AESModeOfOperationCTR(ek, counter=ctr)
+    ct = aes.encrypt(raw)
+    mac = hmac.new(mk, MAGIC+salt+iv+ct, hashlib.sha256).digest()
+    return MAGIC+salt+iv+ct+mac
+
+def dec_json(blob:bytes, pin:str)->dict:
+    if not blob or blob[:3]!=MAGIC: raise ValueError("bad file")
+    salt=blob[3:19]; iv=blob[19:35]; ct=blob[35:-32]; mac=blob[-32:]
+    ek, mk = derive(pin, salt)
+    mac2 = hmac.new(mk, blob[:-32], hashlib.sha256).digest()
+    if not hmac.compare_digest(mac, mac2): raise ValueError("bad pin")
+    ctr = pyaes.Counter(int.from_bytes(iv,"big"))
+    aes = pyaes.AESModeOfOperationCTR(ek, counter=ctr)
+    raw = aes.decrypt(ct)
+    return json.loads(raw.decode())
+
+def load_keys(path:str, pin:str)->dict:
+    # secrets.enc as written by the app -> {exchange: {api_key, secret[, passphrase]}}
+    with open(path,"rb") as f: return dec_json(f.read(), pin)
+
+# ---------- Core scan ----------
+def get_wallet_info(exchange:str, asset:str, keys:dict, cache:dict):
+    if exchange not in NET_FETCHERS: return {}
+    if exchange in LAZY_NETS:
+        return NET.lazy(exchange).get(asset, {})   # unresolved → {} until ASSETS fills it, no network here
+    return NET.fetch(exchange, keys.get(exchange, {})).get(asset, {})
+
+def compute_net(ask, bid, notional, ex_buy, ex_sell, wd_fee_base, conv=False):
+    q = notional/ask
+    fee_buy = notional * TAKER_FEE.get(ex_buy,0.001)
+    fee_sell= (q*bid) * TAKER_FEE.get(ex_sell,0.001)
+    if conv: fee_sell*=2   # proceeds arrive in another quote → one more taker to convert back
+    wd_usd = wd_fee_base * ask
+    gross = q*(bid-ask)
+    net = gross - fee_buy - fee_sell - wd_usd
+    pct = (net/notional)*100.0
+    return net, pct
+
+# ---------- Join ----------
+QUOTES = ("USDT","USDC","BTC","ETH")   # every quote the ticker parsers keep
+
+def quote_rates(books, quotes=QUOTES):
+    # USD value of each quote from the same snapshot: USDT is the anchor, the rest the median Q/USDT mid
+    rates={"USDT":1.0}
+    for q in quotes:
+        if q in rates: continue
+        mids=sorted((p["bid"]+p["ask"])/2 for b in books.values() for p in (b.get((q,"USDT")),)
+                    if p and p["bid"]>0 and p["ask"]>0)
+        if mids: rates[q]=mids[len(mids)//2]
+    return {q:r for q,r in rates.items() if q in quotes}
+
+def index_books(books, rates):
+    # base -> [(exchange, bid, ask, quote)], prices in USD; quotes without a rate are left out
+    idx={}
+    for ex, book in books.items():
+        for (base,q), p in book.items():
+            r=rates.get(q)
+            if r is None: continue
+            idx.setdefault(base, []).append((ex, p["bid"]*r, p["ask"]*r, q))
+    return idx
+
+def join_symbol(venues, notional, min_pct, min_abs, top_n=None):
+    # candidates (src, dst, ask, bid, quote, sell quote) of one base whose spread net of taker fees can still pass
+    # the filters; withdraw fees only lower net, so nothing dropped here could have passed later
+    if len(venues)<2: return []
+    asks=sorted((v for v in venues if v[2]>0), key=lambda v: v[2])
+    bids=sorted((v for v in venues if v[1]>0), key=lambda v: -v[1])
+    if top_n: asks, bids = asks[:top_n], bids[:top_n]
+    out=[]
+    spreads=0
+    for src,_,ask,qa in asks:
+        if not bids or bids[0][1]<=ask: break   # asks صعودی → بقیه هم اسپرد ندارند
+        for dst,bid,_,qb in bids:
+            if bid<=ask: break
+            if dst==src: continue   # same venue, two quotes: a triangle, left to the cycle search
+            spreads+=1
+            net, pct = compute_net(ask, bid, notional, src, dst, 0.0, qa!=qb)
+            if net<min_abs or pct<min_pct: continue
+            out.append((src, dst, ask, bid, qa, qb))
+    if spreads and METRICS.on:
+        METRICS.count("spreads", spreads); METRICS.count("rejected.taker_fees", spreads-len(out))
+    return out
+
+def join_batch(books, rates, exchanges, notional, min_pct, min_abs):
+    # same candidates as join_symbol over every base: one contiguous (bases x exchange-quote columns) USD array
+    exs=list(exchanges); qs=list(rates)
+    cols=[(ex,q) for ex in exs for q in qs]; C=len(cols)
+    fee=np.array([TAKER_FEE.get(ex,0.001) for ex,_ in cols], dtype=np.float64)
+    xe=np.array([exs.index(ex) for ex,_ in cols]); xq=np.array([qs.index(q) for _,q in cols])
+    same=xe[:,None]==xe[None,:]
+    conv=np.where(xq[:,None]!=xq[None,:], 2.0, 1.0)
+    pos={}; fills=[]
+    for ex in exs:
+        by_q={}
+        for k,p in (books.get(ex) or {}).items():
+            if k[1] in rates: by_q.setdefault(k[1], []).append((k[0], p))
+        for q, kps in by_q.items():
+            r=rates[q]
+            fills.append((cols.index((ex,q)), [pos.setdefault(b, len(pos)) for b,_ in kps],
+                          [p["bid"]*r for _,p in kps], [p["ask"]*r for _,p in kps]))
+    if not pos: return []
+    bid=np.zeros((len(pos),C)); ask=np.zeros((len(pos),C))
+    for j,rows,bs,az in fills: bid[rows,j]=bs; ask[rows,j]=az
+    # only bases whose best bid anywhere beats their best ask anywhere go into the (base, buy, sell) cube
+    rows=np.nonzero(bid.max(axis=1) > np.where(ask>0, ask, np.inf).min(axis=1))[0]
+    bid, ask = bid[rows], ask[rows]
+    i,j,k=np.nonzero((ask[:,:,None]>0)&(bid[:,None,:]>ask[:,:,None])&~same)
+    a, b = ask[i,j], bid[i,k]
+    # همان ترتیب عملیات compute_net با wd_fee=0 تا نتیجه بیت‌به‌بیت یکسان باشد
+    units=notional/a
+    net=units*(b-a) - notional*fee[j] - (units*b)*(fee[k]*conv[j,k])
+    pct=(net/notional)*100.0
+    m=(net>=min_abs)&(pct>=min_pct)
+    if METRICS.on:
+        n=int(m.sum()); METRICS.count("spreads", len(i)); METRICS.count("rejected.taker_fees", len(i)-n)
+    bases=list(pos)
+    return [(bases[x], cols[y][1], cols[y][0], cols[z][0], av, bv, cols[z][1]) for x,y,z,av,bv in
+            zip(rows[i[m]].tolist(), j[m].tolist(), k[m].tolist(), a[m].tolist(), b[m].tolist())]
+
+def join_books(books, rates, notional, min_pct, min_abs, top_n=None):
+    # -> [(base, quote, src, dst, ask, bid, sell quote)] past the taker-fee filter; ask/bid in USD
+    if np is not None and not top_n:
+        return join_batch(books, rates, list(books), notional, min_pct, min_abs)
+    return [(base, qa, src, dst, ask, bid, qb) for base, venues in index_books(books, rates).items()
+            for src, dst, ask, bid, qa, qb in join_symbol(venues, notional, min_pct, min_abs, top_n)]
+
+# ---------- Transfer routes ----------
+def build_routes(wa, wb):
+    # usable chains from a withdraw-side and a deposit-side wallet -> [(chain, wd_fee, min_wd)], cheapest first
+    out=[]
+    for ch, ia in (wa or {}).items():
+        ib = (wb or {}).get(ch)
+        if not ib: continue
+        if not (ia.get("can_wd") and ib.get("can_dep")): continue
+        # identity by contract if available
+        if not same_contract(ia.get("contract"), ib.get("contract")): continue
+        out.append((ch, float(ia.get("wd_fee") or 0.0), float(ia.get("min_wd") or 0.0)))
+    out.sort(key=lambda r: r[1])
+    return out
+
+class RouteIndex:
+    # (asset, src, dst) -> build_routes(...); entries of an exchange are dropped when NET changes it
+    def __init__(self):
+        self.routes={}; self.by_ex={}; self.gen=0
+        self._lock=threading.Lock()
+    def get(self, asset, src, dst, api_keys):
+        k=(asset, src, dst)
+        r=self.routes.get(k)
+        if r is not None: return r
+        gen=self.gen
+        r=build_routes(get_wallet_info(src, asset, api_keys, NET.store), get_wallet_info(dst, asset, api_keys, NET.store))
+        with self._lock:
+            if gen==self.gen:   # اگر در این فاصله NET عوض شد، کش نکن
+                self.routes[k]=r
+                self.by_ex.setdefault(src, set()).add(k); self.by_ex.setdefault(dst, set()).add(k)
+        return r
+    def drop(self, ex, asset=None):
+        with self._lock:
+            self.gen+=1
+            ks=self.by_ex.get(ex)
+            if not ks: return
+            for k in ([k for k in ks if k[0]==asset] if asset else list(ks)):
+                self.routes.pop(k, None); ks.discard(k)
+ROUTES = RouteIndex()
+NET.listeners.append(ROUTES.drop)
+
+def best_route(base, src, dst, ask, bid, notional, api_keys, conv=False):
+    # cheapest usable chain for moving base from src to dst -> (chain, wd_fee, net, pct)
+    units = notional/ask
+    for ch, wd_fee, min_wd in ROUTES.get(base, src, dst, api_keys):
+        if units < min_wd: continue
+        net, pct = compute_net(ask, bid, notional, src, dst, wd_fee, conv)
+        return ch, wd_fee, net, pct
+    return None
+
+def gate_exchanges(selected, api_keys):
+    # only exchanges with every required key are scanned
+    gated=[]
+    for ex in selected:
+        need = EXCHS[ex]["needs"]
+        have = api_keys.get(ex, {})
+        if all(have.get(x) for x in need): gated.append(ex)
+    return gated
+
+def make_row(base, q, src, dst, ask, bid, route, q2=None):
+    # ask in q, bid in q2 (native prices); net$ in USD
+    ch, wd_fee, net, pct = route
+    q2=q2 or q
+    sym=f"{base}/{q}" if q2==q else f"{base}/{q}→{q2}"
+    return {
+        "key": (sym, src, dst),
+        "sym": sym, "q": q, "q2": q2,
+        "src": EXCHS[src]["name"], "dst": EXCHS[dst]["name"],
+        "ask": ask, "bid": bid, "net$": net, "net%": pct,
+        "net": ch, "wd": wd_fee, "base": base
+    }
+
+def row_fees(r):
+    # the Fees text, built only for rows that get shown: cycle rows list their legs, pair rows withdraw fee + takers
+    if "legs" in r: return " · ".join(fmt_leg(l) for l in r["legs"])
+    return f"wd:{r['wd']:g} {r['base']} + takers"+(f" + {r['q2']}→{r['q']}" if r["q2"]!=r["q"] else "")
+
+def rank_key(r): return (r.get("quality")==QUOTE_LAST, -r["net$"], -r["net%"], r["sym"], r["src"], r["dst"])   # last-trade legs go last
+
+def cand_rank(books, c, best):
+    # rank_key of the row (c, best) would make, without making it
+    base, q, src, dst, _, _, q2 = c
+    pa, pb = leg_quotes(books, c)
+    return (QUOTE_LAST in (pa.get("quality"), pb.get("quality")), -best[2], -best[3],
+            f"{base}/{q}" if q2==q else f"{base}/{q}→{q2}", EXCHS[src]["name"], EXCHS[dst]["name"])
+
+TOP_K = 200   # rows a scan builds (scan_real limit); passing candidates past it are only counted, stats["more"]
+
+# ---------- Quote freshness ----------
+MAX_SKEW = 15   # s: a candidate whose older leg was confirmed longer ago is dropped before wallets/depth (> SCAN_DEADLINE)
+
+def leg_quotes(books, c):
+    # the two quotes behind a join candidate (base, quote, src, dst, ask, bid, sell quote)
+    return books[c[2]][(c[0], c[1])], books[c[3]][(c[0], c[6])]
+
+def leg_age(pa, pb, now):
+    # seconds since the older of two quotes was last confirmed; None when neither carries a receive time
+    ts=[p["ts"] for p in (pa, pb) if p.get("ts")]
+    return now-min(ts) if ts else None
+
+def drop_stale(books, cands, max_skew, now):
+    # -> (candidates whose legs were both confirmed within max_skew of now, number dropped)
+    keep=[c for c in cands if (leg_age(*leg_quotes(books, c), now) or 0)<=max_skew]
+    return keep, len(cands)-len(keep)
+
+def scan_real(selected:List[str], quotes:Tuple[str,...], notional:float, min_pct:float, min_abs:float, api_keys:dict,
+              deadline:float=SCAN_DEADLINE, top_n:Optional[int]=None, live:bool=False, depth:bool=False,
+              cycles:bool=False, stats:Optional[dict]=None, max_skew:Optional[float]=None, limit:Optional[int]=None):
+    gated = gate_exchanges(selected, api_keys)
+    if len(gated)<2: return []
+
+    # wallet metadata is checked once per exchange here (cold fetch / stale refresh), alongside the tickers;
+    # the join itself only reads ROUTES
+    warm=[_TICK_POOL.submit(NET.fetch, ex, api_keys.get(ex, {})) for ex in gated if ex not in LAZY_NETS]
+    # tickers: live store where it is fresh, REST for the rest (concurrent, partial on deadline)
+    live_books={}; t_fetch=time.time()
+    with METRICS.stage("scan.fetch"):
+        if live:
+            for ex in gated:
+                b=FEEDS.book(ex)
+                if b is not None: live_books[ex]=b
+        books, lat = fetch_books([ex for ex in gated if ex not in live_books], deadline)
+        books.update(live_books)
+        wait(warm, timeout=deadline)
+    rates=quote_rates(books, quotes)
+    if METRICS.on:
+        METRICS.count("listings", sum(len(b) for b in books.values()))
+        METRICS.count("symbols", len({k[0] for b in books.values() for k in b if k[1] in rates}))
+    if stats is not None:
+        stats["lat"]=lat; stats["live"]=sorted(live_books); stats["books"]={ex:len(b) for ex,b in books.items()}
+        stats["rates"]=rates
+        # when each book was taken (REST: request start + latency, live: last update); venues without a book are absent
+        stats["book_ts"]={ex:(time.time()-LIVE.age(ex) if ex in live_books else t_fetch+lat[ex])
+                          for ex,b in books.items() if b and (ex in live_books or lat.get(ex) is not None)}
+    return scan_books(books, rates, notional, min_pct, min_abs, api_keys, top_n, depth, cycles, stats, max_skew, limit)
+
+def scan_books(books, rates, notional, min_pct, min_abs, api_keys, top_n=None, depth=False, cycles=False, stats=None,
+               max_skew=None, limit=None):
+    # everything after the fetch, on a given snapshot (scan_real, replay.py): join → wallets → filter → sort → depth/cycles
+    # one join over every quote in USD (rates from this snapshot) → best asks/bids across venues and quotes;
+    # wallets only for candidates past the gross filter
+    with METRICS.stage("scan.join"):
+        cands=join_books(books, rates, notional, min_pct, min_abs, top_n)
+    # a leg nobody has confirmed for max_skew seconds (a quiet REST-loaded quote in the live store, a venue that
+    # stopped answering) makes a phantom spread: dropped before any wallet or depth work
+    now=time.time(); stale=0
+    if max_skew is not None:
+        cands, stale = drop_stale(books, cands, max_skew, now)
+        if METRICS.on: METRICS.count("rejected.stale", stale)
+    with METRICS.stage("scan.wallets"):
+        for ex in books:
+            if ex in LAZY_NETS:
+                ASSETS.want(ex, overlap_assets(ex, books), api_keys, {c[0] for c in cands if ex in (c[2], c[3])})
+        for base, q, src, dst, *_ in cands: ROUTES.get(base, src, dst, api_keys)
+    if stats is not None:
+        stats["wallets_pending"]={ex:ASSETS.pending(ex) for ex in books if ex in LAZY_NETS}
+        # venues closed by a 429/418: their books are empty because of the limit, not because the venue is down
+        stats["throttled"]={ex:round(GOV.blocked_for(ex)) for ex in books if GOV.blocked_for(ex)>0}
+        stats["stale"]=stale
+    passed=0
+    def passing():
+        nonlocal passed
+        for c in cands:
+            base, q, src, dst, ask, bid, q2 = c
+            best = best_route(base, src, dst, ask, bid, notional, api_keys, q!=q2)
+            if best and best[2]>=min_abs and best[3]>=min_pct:
+                passed+=1; yield c, best
+            elif METRICS.on:
+                METRICS.count("rejected.withdraw_fee" if best else
+                              "rejected.min_withdraw" if ROUTES.get(base, src, dst, api_keys) else "rejected.no_route")
+    with METRICS.stage("scan.filter"):
+        # with a limit only the best `limit` survive a bounded heap; rows are built for those alone
+        kept=heapq.nsmallest(limit, passing(), key=lambda cb: cand_rank(books, *cb)) if limit else list(passing())
+        out=[]
+        for c, best in kept:
+            base, q, src, dst, ask, bid, q2 = c
+            r=make_row(base, q, src, dst, ask/rates[q], bid/rates[q2], best, q2)
+            pa, pb = leg_quotes(books, c); age=leg_age(pa, pb, now)
+            r["age"]=round(age, 1) if age is not None else None
+            r["quality"]=QUOTE_LAST if QUOTE_LAST in (pa.get("quality"), pb.get("quality")) else QUOTE_BOOK
+            out.append(r)
+    if stats is not None: stats["more"]=passed-len(kept)
+    with METRICS.stage("scan.sort"):
+        out.sort(key=rank_key)
+    if depth and out:
+        with METRICS.stage("scan.depth"):
+            out=apply_depth(out, notional, min_pct, min_abs, rates=rates)
+    # multi-leg loops over the same snapshot (all quotes the venues list, not only the selected ones)
+    if cycles:
+        with METRICS.stage("scan.cycles"):
+            out=sorted(out+scan_cycles(books, notional, min_pct, min_abs, api_keys), key=rank_key)
+            if limit and len(out)>limit:
+                if stats is not None: stats["more"]+=len(out)-limit
+                out=out[:limit]
+    if METRICS.on: METRICS.count("rows", len(out))
+    if stats is not None: stats["quotes"]=quote_counts(out)
+    return out
+
+def quote_counts(rows):
+    # rows per quote; a cross-quote row counts for both of its quotes
+    cnt={}
+    for r in rows:
+        for q in {r["q"], r["q2"]}: cnt[q]=cnt.get(q,0)+1
+    return cnt
+
+# ---------- Order-book depth ----------
+# فقط برای ردیف‌هایی که فیلتر top-of-book را رد کرده‌اند: L2 هر دو طرف، VWAP برای notional، و حداکثر حجم سودده
+DEPTH_LEVELS = 20
+DEPTH_TTL = 3
+DEPTH_MAX_ROWS = 30
+DEPTH_DEADLINE = 6
+
+def _lv(rows): return [(float(r[0]), float(r[1])) for r in rows or []]
+def _first(x): return (x[0] if isinstance(x, list) and x else x) or {}
+
+# ex -> (url, params(base, quote), pick(json) -> {"bids", "asks"} raw levels)
+DEPTH_SPECS = {
+    "binance": ("https://api.binance.com/api/v3/depth", lambda b,q: {"symbol":b+q, "limit":DEPTH_LEVELS}, lambda j: j),
+    "okx":     ("https://www.okx.com/api/v5/market/books", lambda b,q: {"instId":f"{b}-{q}", "sz":DEPTH_LEVELS}, lambda j: _first(j.get("data"))),
+    "gate":    ("https://api.gateio.ws/api/v4/spot/order_book", lambda b,q: {"currency_pair":f"{b}_{q}", "limit":DEPTH_LEVELS}, lambda j: j),
+    "mexc":    ("https://api.mexc.com/api/v3/depth", lambda b,q: {"symbol":b+q, "limit":DEPTH_LEVELS}, lambda j: j),
+    "bitget":  ("https://api.bitget.com/api/v2/spot/market/orderbook", lambda b,q: {"symbol":b+q, "limit":DEPTH_LEVELS}, lambda j: j.get("data") or {}),
+    "xt":      ("https://sapi.xt.com/v4/public/depth", lambda b,q: {"symbol":f"{b}_{q}".lower(), "limit":DEPTH_LEVELS}, lambda j: j.get("result") or {}),
+    "bitmart": ("https://api-cloud.bitmart.com/spot/quotation/v3/books", lambda b,q: {"symbol":f"{b}_{q}", "limit":DEPTH_LEVELS}, lambda j: j.get("data") or {}),
+    "htx":     ("https://api.huobi.pro/market/depth", lambda b,q: {"symbol":(b+q).lower(), "type":"step0", "depth":DEPTH_LEVELS}, lambda j: j.get("tick") or {}),
+    "kraken":  ("https://api.kraken.com/0/public/Depth", lambda b,q: {"pair":b+q, "count":DEPTH_LEVELS}, lambda j: _first(list((j.get("result") or {}).values()))),
+    "bitrue":  ("https://openapi.bitrue.com/api/v1/depth", lambda b,q: {"symbol":b+q, "limit":DEPTH_LEVELS}, lambda j: j),
+}
+_HOST_EX = {}
+def host_exchange(host):
+    # exchange behind a REST host; every endpoint of an exchange shares the host of its depth endpoint
+    ex=_HOST_EX.get(host)
+    if ex is None and host not in _HOST_EX:
+        ex=_HOST_EX[host]=next((e for e, (url, _, _) in DEPTH_SPECS.items() if urlparse.urlsplit(url).hostname==host), None)
+    return ex
+
+_DEPTH_CACHE = {}   # (ex, base, quote) -> (ts, book)
+_depth_lock = threading.Lock()
+
+def fetch_depth(ex, base, q):
+    # {"bids": [(px, qty)] best first, "asks": [...]} or None; cached for DEPTH_TTL seconds
+    k=(ex, base, q)
+    with _depth_lock: hit=_DEPTH_CACHE.get(k)
+    if hit and time.time()-hit[0]<DEPTH_TTL: return hit[1]
+    spec=DEPTH_SPECS.get(ex)
+    if not spec: return None
+    url, params, pick = spec
+    with priority(PRIO_DEPTH): j=http_get(url, params=params(base, q))
+    book=None
+    if j:
+        try:
+            raw=pick(j)
+            book={"bids":_lv(raw.get("bids")), "asks":_lv(raw.get("asks"))}
+        except Exception: book=None
+    if book and book["bids"] and book["asks"]:
+        with _depth_lock: _DEPTH_CACHE[k]=(time.time(), book)
+        return book
+    return None
+
+def buy_fill(asks, notional):
+    # spend notional on asks -> (units, vwap) or None if the book is too thin
+    left=notional; units=0.0
+    for px, qty in asks:
+        if px<=0: continue
+        take=min(left, px*qty); units+=take/px; left-=take
+        if left<=1e-12: return units, notional/units
+    return None
+
+def sell_fill(bids, units):
+    # sell units into bids -> (proceeds, vwap) or None
+    left=units; proceeds=0.0
+    for px, qty in bids:
+        take=min(left, qty); proceeds+=take*px; left-=take
+        if left<=1e-12: return proceeds, proceeds/units
+    return None
+
+def max_profitable(asks, bids, fee_buy, fee_sell):
+    # walk both books while the next unit still profits after takers -> (quote spent, gross profit)
+    i=j=0; ra=asks[0][1] if asks else 0; rb=bids[0][1] if bids else 0
+    cost=profit=0.0
+    while i<len(asks) and j<len(bids):
+        pa, pb = asks[i][0], bids[j][0]
+        if pb*(1-fee_sell)<=pa*(1+fee_buy): break
+        x=min(ra, rb)
+        cost+=x*pa; profit+=x*(pb*(1-fee_sell)-pa*(1+fee_buy))
+        ra-=x; rb-=x
+        if ra<=0:
+            i+=1; ra=asks[i][1] if i<len(asks) else 0
+        if rb<=0:
+            j+=1; rb=bids[j][1] if j<len(bids) else 0
+    return cost, profit
+
+def depth_net(ask_book, bid_book, notional, ex_buy, ex_sell, wd_fee_base, conv=False):
+    # executable version of compute_net -> (net, pct, vwap_ask, vwap_bid, max_notional) or None
+    b=buy_fill(ask_book["asks"], notional)
+    if not b: return None
+    units, vwap_ask = b
+    s=sell_fill(bid_book["bids"], units)
+    if not s: return None
+    proceeds, vwap_bid = s
+    fb, fs = TAKER_FEE.get(ex_buy,0.001), TAKER_FEE.get(ex_sell,0.001)*(2 if conv else 1)
+    net = proceeds - notional - notional*fb - proceeds*fs - wd_fee_base*vwap_ask
+    max_cost, _ = max_profitable(ask_book["asks"], bid_book["bids"], fb, fs)
+    return net, (net/notional)*100.0, vwap_ask, vwap_bid, max_cost
+
+def usd_book(book, rate):
+    if rate==1.0: return book
+    return {"asks":[(p*rate, x) for p,x in book["asks"]], "bids":[(p*rate, x) for p,x in book["bids"]]}
+
+def apply_depth(rows, notional, min_pct, min_abs, deadline=DEPTH_DEADLINE, rates=None):
+    # re-price the best rows on L2 books; rows that can't fill or stop passing the filters are dropped. A row whose
+    # books could not be fetched (404, timeout, throttled) stays as it was with max$=None: unverified, not refuted.
+    # books are walked in USD (rates as in the scan) and VWAPs reported back in each leg's quote
+    rates=rates or {"USDT":1.0}
+    head, tail = rows[:DEPTH_MAX_ROWS], rows[DEPTH_MAX_ROWS:]
+    legs=set()
+    for r in head:
+        _, src, dst = r["key"]; base = r["sym"].split("/")[0]
+        legs.add((src, base, r["q"])); legs.add((dst, base, r["q2"]))
+    futs={_TICK_POOL.submit(fetch_depth, *leg): leg for leg in legs}
+    done,_=wait(futs, timeout=deadline)
+    books={futs[f]: f.result() for f in done}
+    out=[]
+    for r in head:
+        _, src, dst = r["key"]; base = r["sym"].split("/")[0]; q, q2 = r["q"], r["q2"]
+        a, b = books.get((src, base, q)), books.get((dst, base, q2))
+        if a is None or b is None or q not in rates or q2 not in rates:
+            out.append(dict(r, **{"max$":None})); continue
+        d=depth_net(usd_book(a, rates[q]), usd_book(b, rates[q2]), notional, src, dst, r["wd"], q!=q2)
+        if not d: continue
+        net, pct, va, vb, mx = d
+        if net<min_abs or pct<min_pct: continue
+        out.append(dict(r, **{"net$":net, "net%":pct, "ask":va/rates[q], "bid":vb/rates[q2], "max$":mx}))
+    out.sort(key=rank_key)
+    return out+tail
+
+# ---------- Multi-leg cycles ----------
+# گراف: گره = (exchange, asset)، یال = معامله (با کارمزد taker) یا انتقال (با کارمزد برداشت)، وزن = -log(rate)
+# چرخه‌ی با وزن منفی = سود؛ جستجو با طول محدود و بودجه‌ی زمانی
+CYCLE_MAX_LEN = 4
+CYCLE_BUDGET = 0.5     # seconds, including graph build
+CYCLE_PRUNE = 0.02     # partial paths that already lost more than ~2% are not extended
+CYCLE_ROOTS = ("USDT","USDC")
+CYCLE_MAX_ROWS = 50
+CYCLE_KEEP = 2        # walks from distinct roots kept per node
+
+def usd_prices(books):
+    # rough USD value per asset from mids: stablecoin pairs first, then pairs quoted in an already priced asset
+    px={"USDT":1.0, "USDC":1.0}
+    for _ in range(2):
+        for book in books.values():
+            for (base,q), p in book.items():
+                if q in px and base not in px and p["bid"]>0 and p["ask"]>0: px[base]=(p["bid"]+p["ask"])/2*px[q]
+    return px
+
+def build_graph(books, notional, api_keys, transfer_assets=None, deadline=None):
+    # -> {node: [(node, weight, leg)]}; transfer_assets=None → every asset listed on two or more venues.
+    # weights are re-based by log USD price (cycle sums unchanged), so a partial path's weight is its USD loss so far
+    g={}; log=math.log
+    px=usd_prices(books); lp={a:log(v) for a,v in px.items() if v>0}
+    for ex, book in books.items():
+        if deadline and time.perf_counter()>deadline: break
+        f=1.0-TAKER_FEE.get(ex,0.001)
+        for (base,q), p in book.items():
+            if base not in lp or q not in lp: continue
+            bid, ask = p["bid"], p["ask"]; d=lp[base]-lp[q]
+            if bid>0: g.setdefault((ex,base), []).append(((ex,q), d-log(bid*f), ("sell", base, q, ex)))
+            if ask>0: g.setdefault((ex,q), []).append(((ex,base), -d-log(f/ask), ("buy", base, q, ex)))
+    where={}
+    for ex, book in books.items():
+        for base, q in book:
+            where.setdefault(base, set()).add(ex); where.setdefault(q, set()).add(ex)
+    for asset, exs in where.items():
+        if len(exs)<2 or asset not in lp or (transfer_assets is not None and asset not in transfer_assets): continue
+        if deadline and time.perf_counter()>deadline: break
+        for src in exs:
+            for dst in exs:
+                if src==dst: continue
+                units=notional/px[asset]
+                r=[c for c in ROUTES.get(asset, src, dst, api_keys) if units>=c[2]]
+                if not r: continue
+                ch, wd_fee, _ = r[0]
+                keep=1.0-wd_fee/units
+                if keep>0: g.setdefault((src,asset), []).append(((dst,asset), -log(keep), ("send", asset, ch, src, dst)))
+    return g
+
+def find_cycles(g, roots, max_len=CYCLE_MAX_LEN, deadline=None):
+    # length-bounded Bellman-Ford from all roots at once; each node keeps its best CYCLE_KEEP walks from distinct
+    # roots, so one pass costs about CYCLE_KEEP single-source searches -> [(weight, path, legs)], most negative first
+    roots=[r for r in roots if r in g]
+    into={r:{} for r in roots}
+    for u, es in g.items():
+        for v, w, leg in es:
+            if v in into: into[v][u]=(w, leg)
+    found={}
+    # a walk is checked for a way back to its root as it is made, so running out of time loses nothing found so far
+    frontier={r:[(0.0, r, (r,), ())] for r in roots}; n=0
+    for k in range(max_len-1):
+        last = k==max_len-2   # walks made now are max_len long: closed, not kept
+        nxt={}
+        for u, states in frontier.items():
+            es=g.get(u, ())
+            for du, r, path, legs in states:
+                back_to=into[r]
+                for v, w, leg in es:
+                    n+=1   # hub nodes carry thousands of edges: the clock is read every 256 of them, not per walk
+                    if deadline and not n&255 and time.perf_counter()>deadline:
+                        return sorted(found.values(), key=lambda c: c[0])
+                    d=du+w
+                    if d>CYCLE_PRUNE or v in path: continue
+                    p2=path+(v,); l2=legs+(leg,)
+                    back=back_to.get(v) if len(p2)>2 else None
+                    if back and d+back[0]<-1e-12:
+                        i=p2.index(min(p2))   # یک چرخه با چرخش‌های مختلف یک بار ثبت شود
+                        key=p2[i:]+p2[:i]
+                        if key not in found or d+back[0]<found[key][0]: found[key]=(d+back[0], p2+(r,), l2+(back[1],))
+                    if last: continue
+                    cur=nxt.get(v)
+                    if cur is None: nxt[v]=[(d, r, p2, l2)]; continue
+                    for i,c in enumerate(cur):
+                        if c[1]==r: break
+                    else: i=None
+                    if i is not None:
+                        if d<cur[i][0]: cur[i]=(d, r, p2, l2)
+                    elif len(cur)<CYCLE_KEEP: cur.append((d, r, p2, l2))
+                    else:
+                        j=max(range(len(cur)), key=lambda x: cur[x][0])
+                        if d<cur[j][0]: cur[j]=(d, r, p2, l2)
+        frontier=nxt
+        if not frontier: break
+    return sorted(found.values(), key=lambda c: c[0])
+
+def fmt_leg(leg):
+    if leg[0]=="send": return f"{leg[1]} {EXCHS[leg[3]]['name']}→{EXCHS[leg[4]]['name']}"
+    return f"{leg[0]} {leg[1]}/{leg[2]}@{EXCHS[leg[3]]['name']}"
+
+def scan_cycles(books, notional, min_pct, min_abs, api_keys, roots=CYCLE_ROOTS, max_len=CYCLE_MAX_LEN,
+                budget=CYCLE_BUDGET, transfer_assets=None):
+    # triangular (one venue) and cross-venue multi-leg loops -> rows in the scan_real format
+    t0=time.perf_counter()
+    # the search allocates walks by the million; a full collection midway would overrun the budget on its own
+    gc_on=gc.isenabled(); gc.disable()
+    try:
+        g=build_graph(books, notional, api_keys, transfer_assets, t0+budget/2)
+        nodes=[(ex,r) for ex in books for r in roots]
+        cycles=find_cycles(g, nodes, max_len, t0+budget)
+    finally:
+        if gc_on: gc.enable()
+    out=[]
+    for w, path, legs in cycles:
+        pct=(math.exp(-w)-1.0)*100.0; net=notional*pct/100.0
+        if net<min_abs or pct<min_pct: continue
+        if len(out)>=CYCLE_MAX_ROWS: break
+        exs=[]; assets=[]   # a transfer leg stays on one asset, a trade stays on one venue: each shows once
+        for ex,a in path:
+            if not exs or exs[-1]!=ex: exs.append(ex)
+            if not assets or assets[-1]!=a: assets.append(a)
+        out.append({
+            "key": ("cycle",)+tuple(path),
+            "sym": "→".join(assets), "q": path[0][1], "q2": path[0][1],
+            "src": EXCHS[exs[0]]["name"], "dst": "→".join(EXCHS[e]["name"] for e in exs[1:]) or EXCHS[exs[0]]["name"],
+            "ask": 0.0, "bid": 0.0, "net$": net, "net%": pct,
+            "net": "tri" if len(exs)==1 else f"{len(legs)}-leg", "wd": 0.0, "legs": legs
+        })
+    return out
+
+# ---------- Incremental opportunities ----------
+class OpportunityEngine:
+    # current opportunity set over a QuoteStore; a quote change re-evaluates only that base's venues (all quotes).
+    # listeners get batches of events: ("add"|"change", key, row) / ("remove", key, None)
+    def __init__(self, store=None):
+        self.store=store or LIVE
+        self.opps={}; self.by_base={}; self.listeners=[]
+        self.cfg=None; self.updates=0
+        self._dirty=set(); self._cv=threading.Condition(); self._t=None   # worker starts with the first live config
+        self.store.listeners.append(self.on_quote)
+    def configure(self, selected, quotes, notional, min_pct, min_abs, api_keys, top_n=None):
+        # None selected → stop; otherwise every symbol is re-evaluated once
+        gated=gate_exchanges(selected or [], api_keys)
+        events=[]
+        with self._cv:
+            events=[("remove", k, None) for k in self.opps]
+            self.opps={}; self.by_base={}; self._dirty.clear()
+            self.cfg=dict(exchanges=gated, quotes=tuple(quotes), notional=notional, min_pct=min_pct,
+                          min_abs=min_abs, api_keys=api_keys, top_n=top_n) if len(gated)>=2 else None
+            if self.cfg:
+                if self._t is None:
+                    self._t=threading.Thread(target=self._run, daemon=True, name="opps"); self._t.start()
+                for ex in gated: self._dirty.update(k[0] for k in self.store.snapshot(ex) if k[1] in self.cfg["quotes"])
+                self._cv.notify()
+        self._emit(events)
+    def on_quote(self, ex, key):
+        cfg=self.cfg
+        if not cfg or ex not in cfg["exchanges"]: return
+        with self._cv:
+            if key is None: self._dirty.update(k[0] for k in self.store.snapshot(ex) if k[1] in cfg["quotes"])
+            elif key[1] in cfg["quotes"]: self._dirty.add(key[0])
+            else: return
+            self._cv.notify()
+    def _run(self):
+        # به‌روزرسانی‌های پشت‌سرهم یک نماد در یک ارزیابی ادغام می‌شوند
+        while True:
+            with self._cv:
+                while not self._dirty: self._cv.wait()
+                bases, self._dirty = self._dirty, set()
+                cfg=self.cfg
+            if not cfg: continue
+            # conversion rates once per batch; a moved rate reaches other bases on their next tick
+            rates=quote_rates({ex:self.store.books.get(ex, {}) for ex in cfg["exchanges"]}, cfg["quotes"])
+            events=[]
+            for base in bases:
+                if cfg is not self.cfg: break
+                try: events+=self._update(base, cfg, rates)
+                except Exception: pass
+            self._emit(events)
+    def evaluate(self, base, cfg, rates):
+        venues=[]
+        for ex in cfg["exchanges"]:
+            book=self.store.books.get(ex, {})
+            for q, rate in rates.items():
+                p=book.get((base,q))
+                if p: venues.append((ex, p["bid"]*rate, p["ask"]*rate, q))
+        rows={}
+        for src, dst, ask, bid, q, q2 in join_symbol(venues, cfg["notional"], cfg["min_pct"], cfg["min_abs"], cfg["top_n"]):
+            best=best_route(base, src, dst, ask, bid, cfg["notional"], cfg["api_keys"], q!=q2)
+            if best and best[2]>=cfg["min_abs"] and best[3]>=cfg["min_pct"]:
+                r=make_row(base, q, src, dst, ask/rates[q], bid/rates[q2], best, q2); rows[r["key"]]=r
+        return rows
+    def _update(self, base, cfg, rates):
+        new=self.evaluate(base, cfg, rates)
+        events=[]
+        with self._cv:
+            if cfg is not self.cfg: return []
+            self.updates+=1
+            for k in self.by_base.get(base, set())-new.keys():
+                self.opps.pop(k, None); events.append(("remove", k, None))
+            for k, r in new.items():
+                old=self.opps.get(k)
+                if old!=r: events.append(("change" if old else "add", k, r))
+                self.opps[k]=r
+            if new: self.by_base[base]=set(new)
+            else: self.by_base.pop(base, None)
+        return events
+    def _emit(self, events):
+        if not events: return
+        for fn in self.listeners:
+            try: fn(events)
+            except Exception: pass
+    def rows(self):
+        with self._cv: return sorted(self.opps.values(), key=rank_key)
+ENGINE = OpportunityEngine(LIVE)
+
+# ---------- Adaptive refresh ----------
+# the next scan is armed when the last one ends (no dropped ticks): sooner while rows appear and move, later when calm,
+# never so soon that scanning takes more than the CPU budget (lower on battery). Every SCHED_FULL_EVERY-th scan covers
+# all venues; in between only the hot ones (venues of rows that just moved). Tickers are bulk per-venue lists, so a hot
+# symbol is refreshed through its venues. A venue that fails twice in a row sits out with exponential backoff.
+SCHED_MIN, SCHED_MAX = 5, 120     # s between scans
+SCHED_FULL_EVERY = 3
+SCHED_MOVE = 0.05                 # a row moved: net$ changed by more than 5% since it was last seen
+SCHED_BUDGET = 0.25               # at most this share of wall time spent scanning
+SCHED_BUDGET_BATTERY = 0.08
+SCHED_BACKOFF_MAX = 600
+
+def row_exchanges(r):
+    # exchange ids behind a row, from its key: (sym, src, dst) or ("cycle", (ex, asset), ...)
+    k=r["key"]
+    return {p[0] for p in k[1:]} if k[0]=="cycle" else {k[1], k[2]}
+
+class AdaptiveScheduler:
+    def __init__(self, interval=15):
+        self.base=interval; self.delay=interval; self.battery=False
+        self.health={}      # ex -> {"fail": consecutive failures, "lat": EWMA s, "until": sits out until}
+        self.cost={}        # "full"/"hot" -> EWMA scan seconds
+        self.activity=0.0   # EWMA share of rows that appeared or moved
+        self.hot=set(); self.seen={}; self.n=0; self.why="first scan"
+        self._keys={}       # ex -> keys health was measured with
+        self._lock=threading.Lock()
+    def plan(self, selected, api_keys, force_full=False):
+        # -> (exchanges for the next scan, full?); only venues scan_real will scan (keys present). New keys wipe a
+        # venue's record, and a forced (user-started) scan tries every venue, backed off or not
+        now=time.time(); gated=gate_exchanges(selected, api_keys)
+        with self._lock:
+            for ex in gated:
+                k=tuple(sorted((api_keys.get(ex) or {}).items()))
+                if self._keys.get(ex)!=k: self._keys[ex]=k; self.health.pop(ex, None)
+            up=gated if force_full else [ex for ex in gated if self.health.get(ex, {}).get("until", 0)<=now]
+            full=force_full or self.n%SCHED_FULL_EVERY==0
+            exs=up if full else [ex for ex in up if ex in self.hot]
+            if len(exs)<2: exs, full = up, True
+        return exs, full
+    def record(self, exchanges, full, rows, stats, duration):
+        now=time.time(); books=stats.get("books") or {}; th=stats.get("throttled") or {}; lat=stats.get("lat") or {}
+        with self._lock:
+            for ex in (exchanges if "books" in stats else ()):   # no books at all: the scan never got to fetch
+                h=self.health.setdefault(ex, {"fail":0, "lat":None, "until":0.0})
+                if books.get(ex):
+                    h["fail"]=0; v=lat.get(ex)
+                    if v is not None: h["lat"]=v if h["lat"] is None else 0.7*h["lat"]+0.3*v
+                else:
+                    h["fail"]+=1
+                    if h["fail"]>=2: h["until"]=now+min(SCHED_BACKOFF_MAX, self.base*2**(h["fail"]-1))
+                if th.get(ex): h["until"]=max(h["until"], now+th[ex])
+            moved=[r for r in rows if r["key"] not in self.seen
+                   or abs(r["net$"]-self.seen[r["key"]])>SCHED_MOVE*abs(self.seen[r["key"]])]
+            if full: self.seen={}
+            self.seen.update((r["key"], r["net$"]) for r in rows)
+            self.activity=0.5*self.activity+0.5*(len(moved)/len(rows) if rows else 0.0)
+            hot=set().union(*(row_exchanges(r) for r in moved)) if moved else set()
+            self.hot=hot if full else self.hot|hot
+            kind="full" if full else "hot"
+            c=self.cost.get(kind); self.cost[kind]=duration if c is None else 0.7*c+0.3*duration
+            self.n+=1
+            # calm → up to 1.5× the set interval, everything moving → 0.4×; then the CPU budget and the bounds
+            d=self.base*(1.5-1.1*self.activity); why=f"activity {self.activity:.0%}"
+            budget=SCHED_BUDGET_BATTERY if self.battery else SCHED_BUDGET
+            floor=duration*(1/budget-1)
+            if floor>d: d=floor; why=f"cpu budget {budget:.0%}"+(" (battery)" if self.battery else "")
+            self.delay=min(SCHED_MAX, max(SCHED_MIN, d)); self.why=why
+        return self.delay
+    def status(self):
+        now=time.time()
+        with self._lock:
+            return {"delay":round(self.delay, 1), "why":self.why, "base":self.base, "activity":round(self.activity, 3),
+                    "cost":{k:round(v, 2) for k,v in self.cost.items()}, "hot":sorted(self.hot), "battery":self.battery,
+                    "backoff":{ex:round(h["until"]-now) for ex,h in self.health.items() if h["until"]>now},
+                    "lat":{ex:round(h["lat"], 2) for ex,h in self.health.items() if h["lat"] is not None},
+                    "next_full":self.n%SCHED_FULL_EVERY==0}
+SCHED = AdaptiveScheduler()
+
+# ---------- Exchange registry ----------
+EXCHS = {
+    "binance":{"name":"Binance","needs":["api_key","secret"]},
+    "okx":{"name":"OKX","needs":["api_key","secret","passphrase"]},
+    "gate":{"name":"Gate.io","needs":["api_key","secret"]},
+    "mexc":{"name":"MEXC","needs":["api_key","secret"]},
+    "bitget":{"name":"Bitget","needs":["api_key","secret","passphrase"]},
+    "xt":{"name":"XT.com","needs":["api_key","secret"]},
+    "bitmart":{"name":"Bitmart","needs":["api_key","secret"]},
+    "htx":{"name":"HTX","needs":["api_key","secret"]},
+    "kraken":{"name":"Kraken","needs":["api_key","secret"]},
+    "bitrue":{"name":"Bitrue","needs":["api_key","secret"]},
+}
@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+# Opportunity history — every scan's rows in SQLite (user_data_dir), written in batches by one background thread.
+#   scans: one row per scan, with the time each exchange's book was taken
+#   routes: (sym, src, dst) dictionary, so observations carry one integer instead of three strings
+#   obs:   (route, scan) -> net %, net $, ask, bid; clustered by route, so a route over a time range is one range read
+#   runs:  one row per continuous appearance of a route (start, end, scans seen, best net), kept much longer than obs
+# Retention drops old obs/runs/scans and unused routes, then an incremental vacuum gives the pages back.
+import json, time, queue, sqlite3, threading
+
+HIST_OBS_DAYS = 2        # per-scan observations
+HIST_RUN_DAYS = 30       # runs (how long / how often a route shows up)
+HIST_GAP = 120           # s: a route seen again after a longer pause (app closed) starts a new run
+HIST_COMPACT_EVERY = 3600
+HIST_BATCH = 32          # scans per transaction at most
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scans(id INTEGER PRIMARY KEY, ts REAL NOT NULL, books TEXT, n INTEGER);
+CREATE INDEX IF NOT EXISTS scans_ts ON scans(ts);
+CREATE TABLE IF NOT EXISTS routes(id INTEGER PRIMARY KEY, sym TEXT NOT NULL, src TEXT NOT NULL, dst TEXT NOT NULL,
+                                  UNIQUE(sym, src, dst));
+CREATE TABLE IF NOT EXISTS obs(route INTEGER NOT NULL, scan INTEGER NOT NULL, pct REAL, net REAL, ask REAL, bid REAL,
+                               PRIMARY KEY(route, scan)) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS obs_scan ON obs(scan);
+CREATE TABLE IF NOT EXISTS runs(id INTEGER PRIMARY KEY, route INTEGER NOT NULL, start REAL NOT NULL, end REAL NOT NULL,
+                                n INTEGER NOT NULL, best_pct REAL, best_net REAL);
+CREATE INDEX IF NOT EXISTS runs_route ON runs(route, start);
+CREATE INDEX IF NOT EXISTS runs_end ON runs(end);
+"""
+
+def route_of(r):
+    return (r["sym"], r["src"], r["dst"])
+
+class History:
+    def __init__(self):
+        self.path=None; self._q=queue.Queue(); self._t=None
+        self._lock=threading.Lock()
+        self.open_runs={}   # (sym, src, dst) -> run start; what the "Since" column shows
+        self.last_ts=0.0
+        self.stats={"scans":0, "obs":0, "batches":0, "compactions":0, "errors":0}
+    # --- lifecycle ---
+    def open(self, path):
+        self.path=path
+        # auto_vacuum only sticks before the first table exists (an older file needs one VACUUM to switch); it has to
+        # come before journal_mode=WAL in _connect, which already creates the file
+        db=sqlite3.connect(path, timeout=10)
+        try:
+            if db.execute("PRAGMA auto_vacuum").fetchone()[0]!=2:
+                db.execute("PRAGMA auto_vacuum=INCREMENTAL"); db.execute("VACUUM")
+        finally: db.close()
+        db=self._connect()
+        try:
+            db.executescript(SCHEMA)
+            # runs still open at the last scan carry on if that scan is recent enough
+            row=db.execute("SELECT max(ts) FROM scans").fetchone()
+            self.last_ts=row[0] or 0.0
+            if time.time()-self.last_ts<HIST_GAP:
+                for sym, src, dst, start in db.execute(
+                        "SELECT r.sym, r.src, r.dst, u.start FROM runs u JOIN routes r ON r.id=u.route WHERE u.end=?",
+                        (self.last_ts,)):
+                    self.open_runs[(sym, src, dst)]=start
+        finally: db.close()
+        self._t=threading.Thread(target=self._run, name="history", daemon=True); self._t.start()
+        return self
+    def close(self):
+        if self._t:
+            self._q.put(None); self._t.join(timeout=10); self._t=None
+    def flush(self, timeout=None):
+        # blocks until everything queued so far is written
+        ev=threading.Event(); self._q.put(ev); return ev.wait(timeout)
+    def _connect(self):
+        db=sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL"); db.execute("PRAGMA synchronous=NORMAL")
+        return db
+    # --- write side ---
+    def record(self, rows, stats=None, ts=None):
+        # annotates rows with "since" (start of their current run) right away; the write happens on the history thread
+        ts=ts or time.time(); stats=stats or {}
+        books=stats.get("book_ts") or {}
+        seen=set()
+        with self._lock:
+            fresh=ts-self.last_ts<HIST_GAP
+            for r in rows:
+                k=route_of(r); seen.add(k)
+                if not fresh or k not in self.open_runs: self.open_runs[k]=ts
+                r["since"]=self.open_runs[k]
+            # a route only ends when both of its books were in this scan; a venue that timed out proves nothing
+            for k in [k for k in self.open_runs if k not in seen]:
+                if not books or not fresh or all(ex in books for ex in _exchanges(k)): del self.open_runs[k]
+            self.last_ts=ts
+        if self.path:
+            self._q.put((ts, books, [(route_of(r), r["net%"], r["net$"], r.get("ask"), r.get("bid")) for r in rows],
+                         fresh))
+    def since(self, key):
+        return self.open_runs.get(key)
+    def _run(self):
+        db=self._connect(); self._routes={}; self._runs={}; last_compact=time.time()
+        try:
+            for run, sym, src, dst in db.execute("SELECT u.id, r.sym, r.src, r.dst FROM runs u JOIN routes r ON r.id=u.route "
+                                                 "WHERE u.end=(SELECT max(ts) FROM scans)"):
+                self._runs[(sym, src, dst)]=run
+        except sqlite3.Error: pass
+        while True:
+            item=self._q.get(); batch=[]; waiters=[]; stop=False
+            while True:
+                if item is None: stop=True
+                elif isinstance(item, threading.Event): waiters.append(item)
+                else: batch.append(item)
+                if len(batch)>=HIST_BATCH: break
+                try: item=self._q.get_nowait()
+                except queue.Empty: break
+            if batch:
+                try: self._write(db, batch)
+                except sqlite3.Error: self.stats["errors"]+=1; db.rollback()
+            if time.time()-last_compact>HIST_COMPACT_EVERY:
+                last_compact=time.time()
+                try: self._compact(db)
+                except sqlite3.Error: self.stats["errors"]+=1
+            for ev in waiters: ev.set()
+            if stop: break
+        db.close()
+    def _route_id(self, db, k):
+        rid=self._routes.get(k)
+        if rid is None:
+            db.execute("INSERT OR IGNORE INTO routes(sym, src, dst) VALUES(?,?,?)", k)
+            rid=self._routes[k]=db.execute("SELECT id FROM routes WHERE sym=? AND src=? AND dst=?", k).fetchone()[0]
+        return rid
+    def _write(self, db, batch):
+        with db:
+            for ts, books, obs, fresh in batch:
+                scan=db.execute("INSERT INTO scans(ts, books, n) VALUES(?,?,?)",
+                                (ts, json.dumps(books, separators=(",",":")), len(obs))).lastrowid
+                db.executemany("INSERT OR REPLACE INTO obs(route, scan, pct, net, ask, bid) VALUES(?,?,?,?,?,?)",
+                               [(self._route_id(db, k), scan, pct, net, ask, bid) for k, pct, net, ask, bid in obs])
+                runs=self._runs if fresh else {}; keep={}
+                for k, pct, net, _, _ in obs:
+                    run=runs.get(k)
+                    if run is None:
+                        run=db.execute("INSERT INTO runs(route, start, end, n, best_pct, best_net) VALUES(?,?,?,?,?,?)",
+                                       (self._routes[k], ts, ts, 1, pct, net)).lastrowid
+                    else:
+                        db.execute("UPDATE runs SET end=?, n=n+1, best_pct=max(best_pct, ?), best_net=max(best_net, ?) "
+                                   "WHERE id=?", (ts, pct, net, run))
+                    keep[k]=run
+                # a route missing only because one of its venues missed this scan keeps its run
+                if books:
+                    for k in runs.keys()-keep.keys():
+                        if not all(ex in books for ex in _exchanges(k)): keep[k]=runs[k]
+                self._runs=keep
+                self.stats["scans"]+=1; self.stats["obs"]+=len(obs)
+        self.stats["batches"]+=1
+    def _compact(self, db):
+        now=time.time()
+        with db:
+            cut=db.execute("SELECT max(id) FROM scans WHERE ts<?", (now-HIST_OBS_DAYS*86400,)).fetchone()[0]
+            if cut: db.execute("DELETE FROM obs WHERE scan<=?", (cut,))
+            db.execute("DELETE FROM runs WHERE end<?", (now-HIST_RUN_DAYS*86400,))
+            db.execute("DELETE FROM scans WHERE ts<?", (now-HIST_RUN_DAYS*86400,))
+            db.execute("DELETE FROM routes WHERE id NOT IN (SELECT route FROM runs) AND id NOT IN (SELECT route FROM obs)")
+        self._routes={}
+        db.execute("PRAGMA incremental_vacuum"); db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        self.stats["compactions"]+=1
+    def compact(self):
+        # out-of-band compaction (settings / cli); runs on its own connection
+        db=self._connect()
+        try: self._compact(db)
+        finally: db.close()
+    # --- read side (own connection per call; WAL lets it run beside the writer) ---
+    def _where(self, sym, src, dst):
+        cl, args = [], []
+        for col, v in (("r.sym", sym), ("r.src", src), ("r.dst", dst)):
+            if v is not None: cl.append(f"{col}=?"); args.append(v)
+        return cl, args
+    def query(self, sym=None, src=None, dst=None, since=None, until=None, limit=1000):
+        # observations, newest first -> [{ts, sym, src, dst, pct, net, ask, bid}]
+        cl, args = self._where(sym, src, dst)
+        if since is not None: cl.append("s.ts>=?"); args.append(since)
+        if until is not None: cl.append("s.ts<?"); args.append(until)
+        sql=("SELECT s.ts, r.sym, r.src, r.dst, o.pct, o.net, o.ask, o.bid FROM obs o "
+             "JOIN routes r ON r.id=o.route JOIN scans s ON s.id=o.scan"
+             + (" WHERE "+" AND ".join(cl) if cl else "") + " ORDER BY s.ts DESC LIMIT ?")
+        db=self._connect()
+        try:
+            return [dict(zip(("ts","sym","src","dst","pct","net","ask","bid"), row)) for row in db.execute(sql, args+[limit])]
+        finally: db.close()
+    def runs(self, sym=None, src=None, dst=None, since=None, until=None, limit=1000):
+        # appearances overlapping [since, until), newest first -> [{sym, src, dst, start, end, n, best_pct, best_net}]
+        cl, args = self._where(sym, src, dst)
+        if since is not None: cl.append("u.end>=?"); args.append(since)
+        if until is not None: cl.append("u.start<?"); args.append(until)
+        sql=("SELECT r.sym, r.src, r.dst, u.start, u.end, u.n, u.best_pct, u.best_net FROM runs u "
+             "JOIN routes r ON r.id=u.route" + (" WHERE "+" AND ".join(cl) if cl else "")
+             + " ORDER BY u.start DESC LIMIT ?")
+        db=self._connect()
+        try:
+            return [dict(zip(("sym","src","dst","start","end","n","best_pct","best_net"), row))
+                    for row in db.execute(sql, args+[limit])]
+        finally: db.close()
+    def summary(self, key, window=86400):
+        # how often and how long (sym, src, dst) showed up in the last window seconds
+        rs=self.runs(*key, since=time.time()-window)
+        if not rs: return {"runs":0, "scans":0, "longest":0.0, "avg":0.0}
+        d=[r["end"]-r["start"] for r in rs]
+        return {"runs":len(rs), "scans":sum(r["n"] for r in rs), "longest":max(d), "avg":sum(d)/len(d)}
+    def size(self):
+        db=self._connect()
+        try:
+            pc=db.execute("PRAGMA page_count").fetchone()[0]; ps=db.execute("PRAGMA page_size").fetchone()[0]
+            fl=db.execute("PRAGMA freelist_count").fetchone()[0]
+            return {"bytes":pc*ps, "free":fl*ps}
+        finally: db.close()
+
+_EX_BY_NAME = {}
+def _exchanges(k):
+    # exchange ids a route touches; rows carry display names (cycle rows: "A→B→C" as dst), book times are by id
+    if not _EX_BY_NAME:
+        from engine import EXCHS
+        _EX_BY_NAME.update({v["name"]:ex for ex,v in EXCHS.items()})
+    return [_EX_BY_NAME.get(n, n) for n in [k[1]]+k[2].split("→")]
+
+HISTORY = History()
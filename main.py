@@ -1,10 +1,6 @@
 # -*- coding: utf-8 -*-
 # ArbTracker APK (Kivy) — Real-Only + Private-API Gated
-import os, json, time, hmac, hashlib, base64, secrets, threading
-from typing import Dict, List, Optional, Tuple
-import urllib.parse as urlparse
-import requests
-import pyaes  # AES-CTR (pure python)
+import os, time, heapq, threading
 
 from kivy.app import App
 from kivy.clock import Clock, mainthread
@@ -19,565 +15,74 @@ from kivy.uix.textinput import TextInput
 from kivy.uix.switch import Switch
 from kivy.uix.modalview import ModalView
 from kivy.uix.widget import Widget
+from kivy.uix.recycleview import RecycleView
+from kivy.uix.recycleview.views import RecycleDataViewBehavior
+from kivy.uix.recycleboxlayout import RecycleBoxLayout
 
-TIMEOUT = 15
-UA = {"User-Agent": "ArbTrackerAPK/1.0"}
+from engine import (ENGINE, EXCHS, FEEDS, MAX_SKEW, METRICS, NET, QUOTES, QUOTE_LAST, SCHED, dec_json, enc_json,
+                    host_exchange, rank_key, row_exchanges, row_fees, scan_real)
+from history import HISTORY, route_of
+try: from plyer import battery   # battery state for the scan budget (Android); optional on desktop
+except ImportError: battery = None
 
-# ---------- HTTP ----------
-def http_get(url, params=None, headers=None, timeout=TIMEOUT):
-    try:
-        hh = dict(UA); 
-        if headers: hh.update(headers)
-        r = requests.get(url, params=params or {}, headers=hh, timeout=timeout)
-        r.raise_for_status()
-        return r.json()
-    except Exception:
-        return None
-
-def http_post(url, data=None, headers=None, timeout=TIMEOUT):
-    try:
-        hh = dict(UA); 
-        if headers: hh.update(headers)
-        r = requests.post(url, data=data or {}, headers=hh, timeout=timeout)
-        r.raise_for_status()
-        return r.json()
-    except Exception:
-        return None
-
-def now_ms(): return int(time.time()*1000)
-
-# ---------- Normalization ----------
-CHAIN_MAP = {
-    "ETHEREUM":"ERC20","ERC20":"ERC20","ETH":"ERC20",
-    "BEP20":"BEP20","BSC":"BEP20","BINANCE SMART CHAIN":"BEP20",
-    "TRON":"TRC20","TRC20":"TRC20","TRX":"TRC20",
-    "ARBITRUM":"ARB","ARBITRUM ONE":"ARB","ARB":"ARB",
-    "OPTIMISM":"OP","OP":"OP",
-    "MATIC":"POLYGON","POLYGON":"POLYGON","POL":"POLYGON",
-    "AVALANCHE":"AVAXC","AVAXC":"AVAXC","AVALANCHE C-CHAIN":"AVAXC",
-    "SOL":"SOL","SOLANA":"SOL",
-    "BASE":"BASE","TON":"TON","SUI":"SUI","APTOS":"APTOS",
-    "BTC":"BTC","BITCOIN":"BTC","LTC":"LTC","LITECOIN":"LTC"
-}
-def norm_chain(s: str)->Optional[str]:
-    if not s: return None
-    u = s.strip().upper()
-    if "-" in u: u = u.split("-")[-1]
-    return CHAIN_MAP.get(u, u)
-
-def norm_pairkey(s: str)->str:
-    return (s or "").upper().replace("-","").replace("_","")
-
-def same_contract(a: Optional[str], b: Optional[str])->bool:
-    if not a and not b: return True
-    if not a or not b: return False
-    return a.strip().lower()==b.strip().lower()
-
-# ---------- Signing ----------
-def sign_qs_sha256(params: dict, secret: str):
-    qs = urlparse.urlencode(params)
-    sig = hmac.new(secret.encode(), qs.encode(), hashlib.sha256).hexdigest()
-    return qs + "&signature=" + sig
-
-def sign_okx(method: str, path: str, body: str, ts: str, secret: str):
-    msg = (ts + method.upper() + path + (body or "")).encode()
-    mac = hmac.new(secret.encode(), msg, hashlib.sha256).digest()
-    return base64.b64encode(mac).decode()
-
-def kraken_private(path: str, data: dict, key: str, secret_b64: str):
-    nonce = str(now_ms())
-    payload = dict(data or {}); payload["nonce"]=nonce
-    postdata = urlparse.urlencode(payload)
-    sha256 = hashlib.sha256((nonce+postdata).encode()).digest()
-    mac = hmac.new(base64.b64decode(secret_b64), path.encode()+sha256, hashlib.sha512)
-    headers = {"API-Key":key,"API-Sign":base64.b64encode(mac.digest()).decode(),"Content-Type":"application/x-www-form-urlencoded", **UA}
-    url = "https://api.kraken.com"+path
-    try:
-        r = requests.post(url, data=postdata, headers=headers, timeout=TIMEOUT)
-        r.raise_for_status()
-        j = r.json()
-        if j.get("error"): return None
-        return j.get("result")
-    except Exception:
-        return None
-
-# ---------- Network caches ----------
-class NetCache: 
-    def __init__(self): self.store={}
-    def get(self,ex): return self.store.get(ex)
-    def set(self,ex,v): self.store[ex]=v
-NET = NetCache()
-
-# ---------- Networks per exchange ----------
-def nets_binance(keys):
-    if NET.get("binance"): return NET.get("binance")
-    k, s = keys.get("api_key"), keys.get("secret")
-    if not (k and s): return {}
-    params={"timestamp":now_ms(),"recvWindow":5000}
-    qs = sign_qs_sha256(params, s)
-    url = "https://api.binance.com/sapi/v1/capital/config/getall?"+qs
-    j = http_get(url, headers={"X-MBX-APIKEY":k}) or []
-    out={}
-    for c in j:
-        sym = (c.get("coin") or "").upper()
-        nm  = c.get("name") or sym
-        for ch in c.get("networkList") or []:
-            n = norm_chain(ch.get("network") or ch.get("name"))
-            if not n: continue
-            out.setdefault(sym,{})[n]={
-                "can_dep": bool(ch.get("depositEnable")),
-                "can_wd":  bool(ch.get("withdrawEnable")),
-                "wd_fee":  float(ch.get("withdrawFee") or 0.0),
-                "min_wd":  float(ch.get("withdrawMin") or 0.0),
-                "min_dep": float(ch.get("depositMin") or 0.0),
-                "contract": (ch.get("contractAddress") or None),
-                "name": nm
-            }
-    NET.set("binance", out); return out
-
-def nets_okx(keys):
-    if NET.get("okx"): return NET.get("okx")
-    # عمومی کفایت می‌کند؛ ولی بدون کلید، این اکسچنج وارد اسکن نمی‌شود (gating)
-    j = http_get("https://www.okx.com/api/v5/asset/currencies") or {}
-    out={}
-    for c in j.get("data",[]):
-        sym = (c.get("ccy") or "").upper()
-        ch  = norm_chain(c.get("chain") or "")
-        if not ch: continue
-        out.setdefault(sym,{})[ch]={
-            "can_dep": (str(c.get("canDep")).lower() in ("1","true")),
-            "can_wd":  (str(c.get("canWd")).lower() in ("1","true")),
-            "wd_fee":  float(c.get("minFee") or c.get("fee") or 0.0),
-            "min_wd":  float(c.get("minWd") or 0.0),
-            "min_dep": float(c.get("minDep") or 0.0),
-            "contract": (c.get("contractAddr") or None),
-            "name": c.get("name") or sym
-        }
-    NET.set("okx", out); return out
-
-def nets_gate(keys):
-    if NET.get("gate"): return NET.get("gate")
-    j = http_get("https://api.gateio.ws/api/v4/spot/currencies", headers={"Accept":"application/json"}) or []
-    out={}
-    for c in j:
-        sym = (c.get("currency") or "").upper()
-        nm  = c.get("name") or sym
-        for ch in c.get("chains") or []:
-            n = norm_chain(ch.get("chain") or ch.get("name"))
-            if not n: continue
-            out.setdefault(sym,{})[n]={
-                "can_dep": not bool(ch.get("deposit_disabled") or ch.get("deposit_disabled_notice")),
-                "can_wd":  not bool(ch.get("withdraw_disabled") or ch.get("withdraw_disabled_notice")),
-                "wd_fee":  float(ch.get("withdraw_fix_on_chain_fee") or ch.get("withdraw_fee") or 0),
-                "min_wd":  float(ch.get("withdraw_min") or 0),
-                "min_dep": float(ch.get("deposit_min") or 0),
-                "contract": (ch.get("contract_address") or None),
-                "name": nm
-            }
-    NET.set("gate", out); return out
-
-def nets_mexc(keys):
-    if NET.get("mexc"): return NET.get("mexc")
-    k, s = keys.get("api_key"), keys.get("secret")
-    if not (k and s): return {}
-    params={"timestamp":now_ms(),"recvWindow":5000}
-    qs = sign_qs_sha256(params, s)
-    url = "https://api.mexc.com/api/v3/capital/config/getall?"+qs
-    j = http_get(url, headers={"X-MEXC-APIKEY":k}) or []
-    out={}
-    for c in j:
-        sym=(c.get("coin") or "").upper()
-        nm=c.get("name") or sym
-        for ch in c.get("networkList") or []:
-            n = norm_chain(ch.get("network") or "")
-            if not n: continue
-            out.setdefault(sym,{})[n]={
-                "can_dep": bool(ch.get("depositEnable")),
-                "can_wd":  bool(ch.get("withdrawEnable")),
-                "wd_fee":  float(ch.get("withdrawFee") or 0),
-                "min_wd":  float(ch.get("withdrawMin") or 0),
-                "min_dep": float(ch.get("depositMin") or 0),
-                "contract": (ch.get("contractAddress") or None),
-                "name": nm
-            }
-    NET.set("mexc", out); return out
-
-def nets_bitget(keys):
-    if NET.get("bitget"): return NET.get("bitget")
-    j = http_get("https://api.bitget.com/api/spot/v1/public/currencies") or {}
-    out={}
-    for c in j.get("data",[]) or []:
-        sym=(c.get("coinName") or c.get("symbol") or "").upper()
-        nm = c.get("name") or sym
-        for ch in c.get("chains") or []:
-            n = norm_chain(ch.get("chain") or "")
-            if not n: continue
-            out.setdefault(sym,{})[n]={
-                "can_dep": str(ch.get("rechargeable")).lower() in ("true","1"),
-                "can_wd":  str(ch.get("withdrawable")).lower() in ("true","1"),
-                "wd_fee":  float(ch.get("withdrawFee") or 0),
-                "min_wd":  float(ch.get("withdrawMin") or 0),
-                "min_dep": float(ch.get("rechargeMin") or 0),
-                "contract": (ch.get("contractAddress") or None),
-                "name": nm
-            }
-    NET.set("bitget", out); return out
-
-def nets_xt(keys):
-    if NET.get("xt"): return NET.get("xt")
-    j = http_get("https://sapi.xt.com/v4/public/wallet/support/currency") or {}
-    out={}
-    for c in j.get("result") or []:
-        sym=(c.get("currency") or "").upper()
-        nm = c.get("name") or sym
-        for ch in c.get("chains") or []:
-            n = norm_chain(ch.get("chain") or "")
-            if not n: continue
-            out.setdefault(sym,{})[n]={
-                "can_dep": not bool(ch.get("depositDisabled")),
-                "can_wd":  not bool(ch.get("withdrawDisabled")),
-                "wd_fee":  float(ch.get("withdrawFee") or 0),
-                "min_wd":  float(ch.get("withdrawMin") or 0),
-                "min_dep": float(ch.get("depositMin") or 0),
-                "contract": (ch.get("contractAddress") or None),
-                "name": nm
-            }
-    NET.set("xt", out); return out
-
-def nets_bitmart(keys):
-    if NET.get("bitmart"): return NET.get("bitmart")
-    j = http_get("https://api-cloud.bitmart.com/spot/v1/currencies") or {}
-    out={}
-    for c in j.get("data",{}).get("currencies",[]):
-        sym=(c.get("currency") or "").upper()
-        nm = c.get("name") or sym
-        for ch in c.get("chains") or []:
-            n = norm_chain(ch.get("chain") or "")
-            if not n: continue
-            out.setdefault(sym,{})[n]={
-                "can_dep": bool(ch.get("deposit_enabled")),
-                "can_wd":  bool(ch.get("withdraw_enabled")),
-                "wd_fee":  float(ch.get("withdraw_fee") or 0),
-                "min_wd":  float(ch.get("withdraw_min") or 0),
-                "min_dep": float(ch.get("deposit_min") or 0),
-                "contract": (ch.get("contract_address") or None),
-                "name": nm
-            }
-    NET.set("bitmart", out); return out
-
-def nets_htx(keys):
-    if NET.get("htx"): return NET.get("htx")
-    j = http_get("https://api.huobi.pro/v2/reference/currencies") or {}
-    out={}
-    for c in j.get("data",[]) or []:
-        sym=(c.get("currency") or "").upper()
-        nm = c.get("display-name") or sym
-        for ch in c.get("chains") or []:
-            n = norm_chain(ch.get("chain") or "")
-            if not n: continue
-            out.setdefault(sym,{})[n]={
-                "can_dep": (ch.get("depositStatus")=="allowed"),
-                "can_wd":  (ch.get("withdrawStatus")=="allowed"),
-                "wd_fee":  float(ch.get("transactFeeWithdraw") or 0),
-                "min_wd":  float(ch.get("minWithdrawAmt") or 0),
-                "min_dep": float(ch.get("minDepositAmt") or 0),
-                "contract": (ch.get("contractAddr") or None),
-                "name": nm
-            }
-    NET.set("htx", out); return out
-
-def nets_kraken(keys):
-    # lazy در حین نیاز پر می‌شود
-    return {}
-
-def ensure_kraken_asset(asset, keys, store):
-    if asset in store: return
-    k, s_b64 = keys.get("api_key"), keys.get("secret")
-    if not (k and s_b64): return
-    deps = kraken_private("/0/private/DepositMethods", {"asset": asset}, k, s_b64) or []
-    wds  = kraken_private("/0/private/WithdrawMethods", {"asset": asset}, k, s_b64) or []
-    dep = {norm_chain(d.get("method")): True for d in deps}
-    wd  = {norm_chain(w.get("method")): True for w in wds}
-    res={}
-    for ch in set(list(dep.keys())+list(wd.keys())):
-        if not ch: continue
-        res[ch]={
-            "can_dep": dep.get(ch, False),
-            "can_wd":  wd.get(ch, False),
-            "wd_fee":  0.0,
-            "min_wd":  0.0,
-            "min_dep": 0.0,
-            "contract": None,
-            "name": asset
-        }
-    store[asset]=res
-
-def nets_bitrue(keys):
-    # شبکه‌ها ممکنه پایدار نباشند
-    return {}
-
-NET_FETCHERS = {
-    "binance": nets_binance, "okx": nets_okx, "gate": nets_gate, "mexc": nets_mexc,
-    "bitget": nets_bitget, "xt": nets_xt, "bitmart": nets_bitmart, "htx": nets_htx,
-    "kraken": nets_kraken, "bitrue": nets_bitrue
-}
-
-# ---------- Tickers ----------
-def tickers_binance():
-    j = http_get("https://api.binance.com/api/v3/ticker/bookTicker") or []
-    out={}
-    for r in j:
-        s = norm_pairkey(r.get("symbol",""))
-        for q in ("USDT","USDC","BTC","ETH"):
-            if s.endswith(q):
-                base = s[:-len(q)]
-                out[(base,q)] = {"bid": float(r["bidPrice"]), "ask": float(r["askPrice"])}
-                break
-    return out
-
-def tickers_okx():
-    j = http_get("https://www.okx.com/api/v5/market/tickers", params={"instType":"SPOT"}) or {}
-    out={}
-    for it in j.get("data",[]):
-        s = norm_pairkey(it.get("instId",""))
-        for q in ("USDT","USDC","BTC","ETH"):
-            if s.endswith(q):
-                base = s[:-len(q)]
-                out[(base,q)] = {"bid": float(it["bidPx"]), "ask": float(it["askPx"])}
-                break
-    return out
-
-def tickers_gate():
-    j = http_get("https://api.gateio.ws/api/v4/spot/tickers", headers={"Accept":"application/json"}) or []
-    out={}
-    for it in j:
-        s = norm_pairkey(it.get("currency_pair",""))
-        for q in ("USDT","USDC","BTC","ETH"):
-            if s.endswith(q):
-                base = s[:-len(q)]
-                out[(base,q)] = {"bid": float(it.get("highest_bid") or 0), "ask": float(it.get("lowest_ask") or 0)}
-                break
-    return out
-
-def tickers_mexc():
-    j = http_get("https://api.mexc.com/api/v3/ticker/bookTicker") or []
-    out={}
-    for it in j:
-        s = norm_pairkey(it.get("symbol",""))
-        for q in ("USDT","USDC","BTC","ETH"):
-            if s.endswith(q):
-                base = s[:-len(q)]
-                out[(base,q)] = {"bid": float(it["bidPrice"]), "ask": float(it["askPrice"])}
-                break
-    return out
-
-def tickers_bitget():
-    j = http_get("https://api.bitget.com/api/v2/spot/market/tickers") or {}
-    out={}
-    for it in j.get("data",[]) or []:
-        s = norm_pairkey(it.get("symbol",""))
-        for q in ("USDT","USDC","BTC","ETH"):
-            if s.endswith(q):
-                base = s[:-len(q)]
-                out[(base,q)] = {"bid": float(it.get("bidPr") or 0), "ask": float(it.get("askPr") or 0)}
-                break
-    return out
-
-def tickers_xt():
-    j = http_get("https://sapi.xt.com/v4/public/ticker") or {}
-    out={}
-    for it in j.get("result") or []:
-        s = norm_pairkey(it.get("s",""))
-        for q in ("USDT","USDC","BTC","ETH"):
-            if s.endswith(q):
-                base = s[:-len(q)]
-                out[(base,q)] = {"bid": float(it.get("bp") or 0), "ask": float(it.get("ap") or 0)}
-                break
-    return out
-
-def tickers_bitmart():
-    j = http_get("https://api-cloud.bitmart.com/spot/quotation/v3/tickers") or {}
-    out={}
-    for it in j.get("data",{}).get("tickers",[]):
-        s = norm_pairkey(it.get("symbol",""))
-        for q in ("USDT","USDC","BTC","ETH"):
-            if s.endswith(q):
-                base = s[:-len(q)]
-                out[(base,q)] = {"bid": float(it.get("best_bid") or 0), "ask": float(it.get("best_ask") or 0)}
-                break
-    return out
-
-def tickers_htx():
-    j = http_get("https://api.huobi.pro/market/tickers") or {}
-    out={}
-    for it in j.get("data",[]):
-        s = norm_pairkey(it.get("symbol",""))
-        for q in ("USDT","USDC","BTC","ETH"):
-            if s.endswith(q):
-                base = s[:-len(q)]
-                out[(base,q)] = {"bid": float(it.get("bid") or 0), "ask": float(it.get("ask") or 0)}
-                break
-    return out
-
-def tickers_kraken():
-    j = http_get("https://api.kraken.com/0/public/Ticker") or {}
-    out={}
-    for pair, it in (j.get("result") or {}).items():
-        s = norm_pairkey(pair)
-        for q in ("USDT","USDC","BTC","ETH"):
-            if s.endswith(q):
-                base = s[:-len(q)]
-                bid = float(it["b"][0]) if isinstance(it.get("b"), list) else float(it.get("b", [0])[0])
-                ask = float(it["a"][0]) if isinstance(it.get("a"), list) else float(it.get("a", [0])[0])
-                out[(base,q)] = {"bid": bid, "ask": ask}
-                break
-    return out
-
-def tickers_bitrue():
-    j = http_get("https://openapi.bitrue.com/api/v1/ticker/24hr") or []
-    out={}
-    for it in j:
-        s = norm_pairkey(it.get("symbol",""))
-        for q in ("USDT","USDC","BTC","ETH"):
-            if s.endswith(q):
-                base = s[:-len(q)]
-                p = float(it.get("lastPrice") or 0)
-                if p>0:
-                    out[(base,q)] = {"bid": p, "ask": p}
-                break
-    return out
-
-TICKERS = {
-    "binance": tickers_binance, "okx": tickers_okx, "gate": tickers_gate, "mexc": tickers_mexc,
-    "bitget": tickers_bitget, "xt": tickers_xt, "bitmart": tickers_bitmart, "htx": tickers_htx,
-    "kraken": tickers_kraken, "bitrue": tickers_bitrue
-}
-
-TAKER_FEE = {
-    "binance":0.0010,"okx":0.0010,"gate":0.0020,"mexc":0.0020,"bitget":0.0010,
-    "xt":0.0020,"bitmart":0.0025,"htx":0.0020,"kraken":0.0026,"bitrue":0.0010
-}
-
-# ---------- Secure key storage (AES-CTR + HMAC) ----------
-MAGIC=b"AK1"
-def derive(pin:str, salt:bytes):
-    dk = hashlib.pbkdf2_hmac("sha256", pin.encode(), salt, 200_000, dklen=64)
-    return dk[:32], dk[32:]
-
-def enc_json(obj:dict, pin:str)->bytes:
-    raw = json.dumps(obj, ensure_ascii=False).encode()
-    salt = secrets.token_bytes(16); iv = secrets.token_bytes(16)
-    ek, mk = derive(pin, salt)
-    ctr = pyaes.Counter(int.from_bytes(iv,"big"))
-    aes = pyaes.AESModeOfOperationCTR(ek, counter=ctr)
-    ct = aes.encrypt(raw)
-    mac = hmac.new(mk, MAGIC+salt+iv+ct, hashlib.sha256).digest()
-    return MAGIC+salt+iv+ct+mac
-
-def dec_json(blob:bytes, pin:str)->dict:
-    if not blob or blob[:3]!=MAGIC: raise ValueError("bad file")
-    salt=blob[3:19]; iv=blob[19:35]; ct=blob[35:-32]; mac=blob[-32:]
-    ek, mk = derive(pin, salt)
-    mac2 = hmac.new(mk, blob[:-32], hashlib.sha256).digest()
-    if not hmac.compare_digest(mac, mac2): raise ValueError("bad pin")
-    ctr = pyaes.Counter(int.from_bytes(iv,"big"))
-    aes = pyaes.AESModeOfOperationCTR(ek, counter=ctr)
-    raw = aes.decrypt(ct)
-    return json.loads(raw.decode())
-
-# ---------- Core scan ----------
-def get_wallet_info(exchange:str, asset:str, keys:dict, cache:dict):
-    fn = NET_FETCHERS.get(exchange)
-    if not fn: return {}
-    data = fn(keys.get(exchange, {})) or {}
-    if exchange=="kraken":
-        if asset not in data:
-            ensure_kraken_asset(asset, keys.get("kraken", {}), data)
-            NET.store["kraken"]=data
-    return data.get(asset, {})
-
-def compute_net(ask, bid, notional, ex_buy, ex_sell, wd_fee_base):
-    q = notional/ask
-    fee_buy = notional * TAKER_FEE.get(ex_buy,0.001)
-    fee_sell= (q*bid) * TAKER_FEE.get(ex_sell,0.001)
-    wd_usd = wd_fee_base * ask
-    gross = q*(bid-ask)
-    net = gross - fee_buy - fee_sell - wd_usd
-    pct = (net/notional)*100.0
-    return net, pct
-
-def scan_real(selected:List[str], quotes:Tuple[str,...], notional:float, min_pct:float, min_abs:float, api_keys:dict):
-    # gate by keys
-    gated=[]
-    for ex in selected:
-        need = EXCHS[ex]["needs"]
-        have = api_keys.get(ex, {})
-        if all(have.get(x) for x in need): gated.append(ex)
-    if len(gated)<2: return []
-
-    # tickers
-    books={}
-    for ex in gated:
-        try: books[ex]=TICKERS[ex]() or {}
-        except Exception: books[ex]={}
-
-    out=[]
-    # pairwise
-    for i, a in enumerate(gated):
-        for b in gated[i+1:]:
-            A, B = books.get(a,{}), books.get(b,{})
-            for (base,q), pa in A.items():
-                if q not in quotes: continue
-                pb = B.get((base,q))
-                if not pb: continue
-                # check both directions: a->b and b->a
-                for (src, dst, pbuy, psell) in ((a,b,pa,pb),(b,a,pb,pa)):
-                    ask = pbuy["ask"]; bid = psell["bid"]
-                    if ask<=0 or bid<=0: continue
-                    wa = get_wallet_info(src, base, api_keys, NET.store)  # withdraw
-                    wb = get_wallet_info(dst, base, api_keys, NET.store)  # deposit
-                    if not wa or not wb: continue
-                    best=None
-                    for ch, ia in wa.items():
-                        ib = wb.get(ch)
-                        if not ib: continue
-                        if not (ia.get("can_wd") and ib.get("can_dep")): continue
-                        # identity by contract if available
-                        if not same_contract(ia.get("contract"), ib.get("contract")): continue
-                        # min withdraw check
-                        min_wd = float(ia.get("min_wd") or 0.0)
-                        units = notional/ask
-                        if units < min_wd: continue
-                        net, pct = compute_net(ask, bid, notional, src, dst, float(ia.get("wd_fee") or 0.0))
-                        row = {
-                            "sym": f"{base}/{q}",
-                            "src": EXCHS[src]["name"], "dst": EXCHS[dst]["name"],
-                            "ask": ask, "bid": bid, "net$": net, "net%": pct,
-                            "net": ch,
-                            "fees": f"wd:{float(ia.get('wd_fee') or 0.0):g} {base} + takers"
-                        }
-                        if best is None or row["net$"]>best["net$"]: best=row
-                    if best and best["net$"]>=min_abs and best["net%"]>=min_pct:
-                        out.append(best)
-    out.sort(key=lambda r:(-r["net$"], -r["net%"]))
-    return out
-
-# ---------- Exchange registry ----------
-EXCHS = {
-    "binance":{"name":"Binance","needs":["api_key","secret"]},
-    "okx":{"name":"OKX","needs":["api_key","secret","passphrase"]},
-    "gate":{"name":"Gate.io","needs":["api_key","secret"]},
-    "mexc":{"name":"MEXC","needs":["api_key","secret"]},
-    "bitget":{"name":"Bitget","needs":["api_key","secret","passphrase"]},
-    "xt":{"name":"XT.com","needs":["api_key","secret"]},
-    "bitmart":{"name":"Bitmart","needs":["api_key","secret"]},
-    "htx":{"name":"HTX","needs":["api_key","secret"]},
-    "kraken":{"name":"Kraken","needs":["api_key","secret"]},
-    "bitrue":{"name":"Bitrue","needs":["api_key","secret"]},
-}
+def on_battery():
+    try: return battery is not None and battery.status.get("isCharging") is False
+    except Exception: return False
 
 # ---------- UI components ----------
-COLS=[("Symbol",150),("Buy→Sell",220),("Net %",90),("Net $",110),("Network",110),("Fees",180)]
+def fmt_latency(lat, live=()):
+    parts=[f"{EXCHS[ex]['name']} live" for ex in live]
+    parts+=[f"{EXCHS[ex]['name']} {int(v*1000)}ms" if v is not None else f"{EXCHS[ex]['name']} timeout"
+            for ex,v in sorted(lat.items(), key=lambda kv: (kv[1] is None, kv[1] or 0))]
+    return "  ".join(parts)
+
+def fmt_metrics(snap):
+    # diagnostics panel text: stages (avg/last/max ms), hosts (requests, KB, errors), counters
+    ms=lambda x: f"{x*1000:.0f}"
+    out=[f"since {time.strftime('%H:%M:%S', time.localtime(snap['since']))}" + ("" if snap["enabled"] else "  (off)")]
+    for k,v in sorted(snap["stages"].items()):
+        out.append(f"{k:22} n={v['n']:<4} avg {ms(v['total']/v['n']):>5}  last {ms(v['last']):>5}  max {ms(v['max']):>5}")
+    for h,v in sorted(snap["requests"].items(), key=lambda kv: -kv[1]["total"]):
+        err=", ".join(f"{e}×{n}" for e,n in v["errors"].items())
+        out.append(f"{(v['ex'] and EXCHS[v['ex']]['name']) or h:22} n={v['n']:<4} avg {ms(v['total']/v['n']):>5}  "
+                   f"max {ms(v['max']):>5}  {v['bytes']//1024}KB" + (f"  {err}" if err else ""))
+    out+=[f"{k:22} {v}" for k,v in sorted(snap["counters"].items())]
+    for h,v in sorted(snap.get("fetch", {}).items()):
+        out.append(f"{'fetch '+((host_exchange(h) and EXCHS[host_exchange(h)]['name']) or h):22} {v['wire']//1024}KB wire / "
+                   f"{v['body']//1024}KB body  saved {v['saved']//1024}KB  304×{v['304']}  same×{v['same']}  parsed×{v['parsed']}")
+    for h,v in sorted(snap.get("pool", {}).items()):
+        out.append(f"{'conn '+((host_exchange(h) and EXCHS[host_exchange(h)]['name']) or h):22} n={v['req']:<4} "
+                   f"opened {v['new']}  reused {v['reused']}")
+    st=snap.get("scheduler")
+    if st:
+        out.append(f"{'scheduler':22} {fmt_sched(st)}  activity {st['activity']:.0%}  base {st['base']}s"
+                   + "".join(f"  {k} {v:.1f}s" for k,v in st["cost"].items()) + ("  battery" if st["battery"] else ""))
+    for k,v in sorted(snap.get("governor", {}).items()):
+        out.append(f"{'gov '+k:22} n={v['req']:<4} waited {v['waited']} ({v['wait_s']:.1f}s)  queue {v['depth']}/{v['max_depth']}"
+                   + (f"  throttled {v['throttled']}" if v["throttled"] else "") + (f"  429×{v['limited']}" if v["limited"] else "")
+                   + (f"  closed {v['blocked']}s" if v["blocked"] else ""))
+    return "\n".join(out)
+
+def fmt_sched(st):
+    # cadence and the reasons behind it, for the status line
+    parts=[f"next {st['delay']:.0f}s ({st['why']})"]
+    if st["hot"]: parts.append("hot: "+", ".join(EXCHS[ex]["name"] for ex in st["hot"] if ex in EXCHS))
+    parts+=[f"{EXCHS[ex]['name']} paused {sec}s" for ex,sec in st["backoff"].items()]
+    return "  ".join(parts)
+
+def fmt_quotes(cnt):
+    return " · ".join(f"{q} {cnt[q]}" for q in QUOTES if cnt.get(q))
+
+def fmt_throttled(th):
+    return "  ".join(f"{EXCHS[ex]['name']} rate-limited {sec}s" for ex,sec in th.items())
+
+def fmt_stale(n):
+    return f"{n} stale dropped" if n else ""
+
+def fmt_pending(pending):
+    return "  ".join(f"{EXCHS[ex]['name']} wallets: {n} pending" for ex,n in pending.items() if n)
+
+COLS=[("Symbol",150),("Buy→Sell",220),("Net %",90),("Net $",110),("Since",70),("Network",110),("Fees",180)]
 TOTAL_W=sum(dp(w) for _,w in COLS)
 
 def header():
@@ -586,49 +91,100 @@ def header():
         g.add_widget(Label(text=f"[b]{t}[/b]", markup=True, size_hint=(None,1), width=dp(w), font_size=sp(13)))
     return g
 
-class DataGrid(GridLayout):
+ROW_H=28
+PAGE=50   # rows per page; each scan builds one page more than is shown, so "More" is instant
+EMPTY_MSG="فرصت مطابق فیلترها یافت نشد."
+
+def fmt_age(since):
+    # how long the route has been on the board (HISTORY run start)
+    if not since: return ""
+    s=int(time.time()-since)
+    return f"{s}s" if s<60 else f"{s//60}m" if s<3600 else f"{s//3600}h{s%3600//60:02d}m"
+
+def fmt_cells(r):
+    return (
+        r["sym"],
+        (f"{r['src']}@{r['ask']:.8f} → {r['dst']}@{r['bid']:.8f}" if r["ask"] else f"{r['src']} → {r['dst']}")  # cycle rows: no single price
+        + (" · last" if r.get("quality")==QUOTE_LAST else ""),
+        f"{r['net%']:.3f}%",
+        f"{r['net$']:.4f}",
+        fmt_age(r.get("since")),
+        r["net"],
+        row_fees(r)+(f" · max ${r['max$']:.0f}" if r.get("max$") is not None else " · depth n/a" if "max$" in r else "")
+    )
+
+class GridRow(RecycleDataViewBehavior, BoxLayout):
+    # one recycled row; only cells whose text changed are touched
     def __init__(self, **kw):
         super().__init__(**kw)
-        self.cols=len(COLS); self.size_hint=(None,None); self.spacing=dp(6); self.padding=[dp(6),0]; self.width=TOTAL_W
-        self.bind(minimum_height=self.setter("height"))
+        self.size_hint=(None,None); self.width=TOTAL_W; self.height=dp(ROW_H); self.spacing=dp(6); self.padding=[dp(6),0]
+        self.cells=[Label(size_hint=(None,1), width=dp(w), font_size=sp(12)) for _,w in COLS]
+        for c in self.cells: self.add_widget(c)
+        self._wide=False
+    def refresh_view_attrs(self, rv, index, data):
+        wide=data.get("wide", False)
+        if wide!=self._wide:   # ردیف پیام: ستون اول تمام عرض
+            self._wide=wide
+            for c,(_,w) in zip(self.cells, COLS): c.width=(TOTAL_W-dp(12)) if (wide and c is self.cells[0]) else (0 if wide else dp(w))
+        for c, t in zip(self.cells, data["cells"]):
+            if c.text!=t: c.text=t
+
+class DataGrid(RecycleView):
+    # virtualized results: only visible rows exist as widgets; data is keyed by row["key"]
+    def __init__(self, **kw):
+        super().__init__(**kw)
+        self.viewclass=GridRow
+        lay=RecycleBoxLayout(orientation="vertical", size_hint=(None,None), width=TOTAL_W,
+                             default_size=(TOTAL_W, dp(ROW_H)), default_size_hint=(None,None))
+        lay.bind(minimum_height=lay.setter("height"))
+        self.add_widget(lay)
+        self._by_key={}
     def set_rows(self, rows):
-        self.clear_widgets()
         if not rows:
-            self.add_widget(Label(text="فرصت مطابق فیلترها یافت نشد.", size_hint=(None,None), width=TOTAL_W, height=dp(28)))
+            self._by_key={}
+            self.data=[{"key":None, "wide":True, "cells":(EMPTY_MSG,)+("",)*(len(COLS)-1)}]
             return
+        old, new, data = self._by_key, {}, []
         for r in rows:
-            cells=[
-                r["sym"],
-                f"{r['src']}@{r['ask']:.8f} → {r['dst']}@{r['bid']:.8f}",
-                f"{r['net%']:.3f}%",
-                f"{r['net$']:.4f}",
-                r["net"],
-                r["fees"]
-            ]
-            for (t,w), val in zip(COLS, cells):
-                self.add_widget(Label(text=val, size_hint=(None,None), width=dp(w), height=dp(28), font_size=sp(12)))
+            k=r.get("key") or (r["sym"], r["src"], r["dst"])
+            cells=fmt_cells(r)
+            d=old.get(k)
+            if d is None or d["cells"]!=cells: d={"key":k, "cells":cells}
+            new[k]=d; data.append(d)
+        self._by_key=new
+        self.data=data
 
 class FiltersModal(ModalView):
     def __init__(self, init, on_apply, **kw):
-        super().__init__(**kw); self.size_hint=(0.92,0.6); self.background_color=(0,0,0,0.85); self.auto_dismiss=False
+        super().__init__(**kw); self.size_hint=(0.92,0.76); self.background_color=(0,0,0,0.85); self.auto_dismiss=False
         root=BoxLayout(orientation="vertical", padding=dp(10), spacing=dp(8))
         r1=BoxLayout(spacing=dp(8), size_hint=(1,None), height=dp(44))
         r2=BoxLayout(spacing=dp(8), size_hint=(1,None), height=dp(44))
         self.t_notional=TextInput(text=str(int(init["notional"])), input_filter="int", hint_text="Notional")
         self.t_minpct=TextInput(text=str(init["min_pct"]), input_filter="float", hint_text="Min % (net)")
         self.t_minabs=TextInput(text=str(init["min_abs"]), input_filter="float", hint_text="Min $ (net)")
-        self._quote=init["quote"]; b1=Button(text="USDT", on_release=lambda *_: self._setq("USDT"))
-        b2=Button(text="USDC", on_release=lambda *_: self._setq("USDC")); self._btns=(b1,b2); self._refresh()
+        # همه‌ی کوُت‌ها در یک اسکن؛ این فقط فیلتر نمایش است
+        self._quote=init["quote"]; rq=BoxLayout(spacing=dp(8), size_hint=(1,None), height=dp(44))
+        self._btns=[Button(text=q, on_release=lambda b: self._setq(b.text)) for q in QUOTES+("All",)]
+        for b in self._btns: rq.add_widget(b)
+        self._refresh()
+        r3=BoxLayout(spacing=dp(8), size_hint=(1,None), height=dp(44))
+        self.sw_depth=Switch(active=init["depth"])
+        r3.add_widget(Label(text="Order-book depth check")); r3.add_widget(self.sw_depth)
+        r4=BoxLayout(spacing=dp(8), size_hint=(1,None), height=dp(44))
+        self.sw_cycles=Switch(active=init["cycles"])
+        r4.add_widget(Label(text="Multi-leg cycles")); r4.add_widget(self.sw_cycles)
         r1.add_widget(self.t_notional); r1.add_widget(self.t_minpct)
-        r2.add_widget(self.t_minabs); r2.add_widget(b1); r2.add_widget(b2)
+        r2.add_widget(self.t_minabs)
         btns=BoxLayout(spacing=dp(8), size_hint=(1,None), height=dp(44))
         btns.add_widget(Button(text="Cancel", on_release=lambda *_: self.dismiss()))
         def apply(*_):
             cfg=dict(notional=float(self.t_notional.text or 1000), min_pct=float(self.t_minpct.text or 0.1),
-                     min_abs=float(self.t_minabs.text or 0.05), quote=self._quote)
+                     min_abs=float(self.t_minabs.text or 0.05), quote=self._quote, depth=self.sw_depth.active,
+                     cycles=self.sw_cycles.active)
             on_apply(cfg); self.dismiss()
         btns.add_widget(Button(text="Apply", on_release=apply))
-        root.add_widget(r1); root.add_widget(r2); root.add_widget(btns); self.add_widget(root)
+        root.add_widget(r1); root.add_widget(r2); root.add_widget(rq); root.add_widget(r3); root.add_widget(r4); root.add_widget(btns); self.add_widget(root)
     def _setq(self,q): self._quote=q; self._refresh()
     def _refresh(self):
         for b in self._btns: b.background_color=(0.2,0.6,1,1) if b.text==self._quote else (0.25,0.25,0.25,1)
@@ -738,7 +294,7 @@ class ApiKeysModal(ModalView):
         except Exception: pass
 
 class SettingsModal(ModalView):
-    def __init__(self, init, on_apply, on_exchs, on_keys, **kw):
+    def __init__(self, init, on_apply, on_exchs, on_keys, on_diag, **kw):
         super().__init__(**kw)
         self.size_hint=(0.92,0.72); self.background_color=(0,0,0,0.88); self.auto_dismiss=False
         root=BoxLayout(orientation="vertical", padding=dp(10), spacing=dp(8))
@@ -747,15 +303,44 @@ class SettingsModal(ModalView):
         self.t_int=TextInput(text=str(init["interval"]), input_filter="int", hint_text="sec")
         r1.add_widget(Label(text="Auto refresh")); r1.add_widget(self.sw_auto)
         r1.add_widget(Label(text="Interval"));     r1.add_widget(self.t_int)
+        r2=BoxLayout(spacing=dp(8), size_hint=(1,None), height=dp(44))
+        self.sw_live=Switch(active=init["live"])
+        r2.add_widget(Label(text="Live feeds (WebSocket)")); r2.add_widget(self.sw_live)
         btn_api=Button(text="API Keys", size_hint=(1,None), height=dp(44), on_release=lambda *_:(self.dismiss(), on_keys()))
         btn_ex =Button(text=f"Select Exchanges ({init['ex_count']})", size_hint=(1,None), height=dp(44), on_release=lambda *_:(self.dismiss(), on_exchs()))
+        btn_dg =Button(text="Diagnostics", size_hint=(1,None), height=dp(44), on_release=lambda *_:(self.dismiss(), on_diag()))
         btns=BoxLayout(spacing=dp(8), size_hint=(1,None), height=dp(44))
         btns.add_widget(Button(text="Close", on_release=lambda *_: self.dismiss()))
         def apply(*_):
-            cfg=dict(auto=self.sw_auto.active, interval=int(self.t_int.text or 15))
+            cfg=dict(auto=self.sw_auto.active, interval=int(self.t_int.text or 15), live=self.sw_live.active)
             on_apply(cfg); self.dismiss()
         btns.add_widget(Button(text="Apply", on_release=apply))
-        root.add_widget(r1); root.add_widget(btn_api); root.add_widget(btn_ex); root.add_widget(btns); self.add_widget(root)
+        root.add_widget(r1); root.add_widget(r2); root.add_widget(btn_api); root.add_widget(btn_ex); root.add_widget(btn_dg); root.add_widget(btns); self.add_widget(root)
+
+class DiagnosticsModal(ModalView):
+    # METRICS viewer: stage timings, per-exchange requests, counters; export goes next to the other app files
+    def __init__(self, **kw):
+        super().__init__(**kw)
+        self.size_hint=(0.96,0.9); self.background_color=(0,0,0,0.9); self.auto_dismiss=False
+        root=BoxLayout(orientation="vertical", padding=dp(10), spacing=dp(8))
+        r1=BoxLayout(spacing=dp(8), size_hint=(1,None), height=dp(44))
+        sw=Switch(active=METRICS.on); sw.bind(active=lambda _,v:(METRICS.enable(v), self.refresh()))
+        r1.add_widget(Label(text="Collect metrics")); r1.add_widget(sw)
+        self.txt=TextInput(readonly=True, font_size=sp(11), font_name="RobotoMono-Regular", size_hint=(1,1))
+        self.note=Label(text="", size_hint=(1,None), height=dp(20), font_size=sp(11), color=(0.7,0.7,0.7,1))
+        btns=BoxLayout(spacing=dp(8), size_hint=(1,None), height=dp(44))
+        btns.add_widget(Button(text="Close", on_release=lambda *_: self.dismiss()))
+        btns.add_widget(Button(text="Refresh", on_release=lambda *_: self.refresh()))
+        btns.add_widget(Button(text="Reset", on_release=lambda *_:(METRICS.reset(), self.refresh())))
+        btns.add_widget(Button(text="Export JSON", on_release=self._export))
+        root.add_widget(r1); root.add_widget(self.txt); root.add_widget(self.note); root.add_widget(btns); self.add_widget(root)
+        self.refresh()
+    def refresh(self):
+        self.txt.text=fmt_metrics(METRICS.snapshot())
+    def _export(self, *_):
+        path=os.path.join(App.get_running_app().user_data_dir, time.strftime("diagnostics-%Y%m%d-%H%M%S.json"))
+        try: self.note.text=f"saved {METRICS.export(path)}"
+        except OSError as e: self.note.text=f"export failed: {e}"
 
 class Root(BoxLayout):
     running=BooleanProperty(False)
@@ -765,10 +350,16 @@ class Root(BoxLayout):
     quote=StringProperty("USDT")
     auto=BooleanProperty(True)
     interval=NumericProperty(15)
+    live=BooleanProperty(False)
+    depth=BooleanProperty(False)
+    cycles=BooleanProperty(False)
     def __init__(self, **kw):
         super().__init__(**kw); self.orientation="vertical"
         self.selected=set(EXCHS.keys())
         self.api_store={}
+        self._rows={}; self._render_ev=None   # key -> row؛ هم نتیجه‌ی اسکن و هم رویدادهای ENGINE
+        self.limit=PAGE; self._more=0   # rows shown; passing rows the last scan did not build
+        ENGINE.listeners.append(self._on_events)
         # Top bar
         top=BoxLayout(size_hint=(1,None), height=dp(50), padding=[dp(8),0], spacing=dp(8))
         btn_f=Button(text="Filters", size_hint=(None,1), width=dp(88), on_release=lambda *_: self.open_filters())
@@ -778,16 +369,21 @@ class Root(BoxLayout):
         btn_set=Button(text="Settings", size_hint=(None,1), width=dp(96), on_release=lambda *_: self.open_settings())
         top.add_widget(btn_f); top.add_widget(sp_l); top.add_widget(btn_s); top.add_widget(sp_r); top.add_widget(btn_set)
         self.add_widget(top)
+        self.status=Label(text="", size_hint=(1,None), height=dp(22), font_size=sp(11), color=(0.7,0.7,0.7,1))
+        self.add_widget(self.status)
         # header + data
         self.h_scroll=ScrollView(do_scroll_x=True, do_scroll_y=False, bar_width=0, size_hint=(1,None), height=dp(30))
         self.h_grid=header(); self.h_scroll.add_widget(self.h_grid); self.add_widget(self.h_scroll)
-        self.d_grid=DataGrid()
-        self.d_scroll=ScrollView(do_scroll_x=True, do_scroll_y=True, size_hint=(1,1)); self.d_scroll.add_widget(self.d_grid); self.add_widget(self.d_scroll)
+        self.d_grid=DataGrid(do_scroll_x=True, do_scroll_y=True, size_hint=(1,1))
+        self.d_scroll=self.d_grid; self.add_widget(self.d_grid)   # RecycleView خودش ScrollView است
+        self.btn_more=Button(text="More", size_hint=(1,None), height=dp(40), disabled=True, on_release=lambda *_: self.more())
+        self.add_widget(self.btn_more)
         # sync x
         self._sync=False
         self.h_scroll.bind(scroll_x=self._from_head); self.d_scroll.bind(scroll_x=self._from_body)
         # auto
-        self._ev=Clock.schedule_interval(lambda *_: self.scan(), self.interval) if self.auto else None
+        # auto refresh: each scan arms the next one when it ends, SCHED picks the delay and the venues
+        self._ev=None; SCHED.base=self.interval
         Clock.schedule_once(lambda *_: self.scan(), 0.5)
     def _from_head(self,_,v):
         if self._sync: return
@@ -796,53 +392,126 @@ class Root(BoxLayout):
         if self._sync: return
         self._sync=True; self.h_scroll.scroll_x=v; self._sync=False
     def open_filters(self):
-        init=dict(notional=self.notional, min_pct=self.min_pct, min_abs=self.min_abs, quote=self.quote)
+        init=dict(notional=self.notional, min_pct=self.min_pct, min_abs=self.min_abs, quote=self.quote, depth=self.depth,
+                  cycles=self.cycles)
         def apply(cfg):
-            self.notional=cfg["notional"]; self.min_pct=cfg["min_pct"]; self.min_abs=cfg["min_abs"]; self.quote=cfg["quote"]
+            self.notional=cfg["notional"]; self.min_pct=cfg["min_pct"]; self.min_abs=cfg["min_abs"]; self.depth=cfg["depth"]
+            self.cycles=cfg["cycles"]; self.quote=cfg["quote"]; self.limit=PAGE
+            self.configure_engine(); self._render()
             self.scan()
         FiltersModal(init, on_apply=apply).open()
     def open_settings(self):
-        init=dict(auto=self.auto, interval=int(self.interval), ex_count=len(self.selected))
+        init=dict(auto=self.auto, interval=int(self.interval), ex_count=len(self.selected), live=self.live)
         def apply(cfg):
-            if cfg["auto"]:
-                self.interval=max(5,int(cfg["interval"] or 15))
-                if self._ev: self._ev.cancel()
-                self._ev=Clock.schedule_interval(lambda *_: self.scan(), self.interval)
-            else:
-                if self._ev: self._ev.cancel(); self._ev=None
+            if cfg["auto"]: self.interval=SCHED.base=max(5,int(cfg["interval"] or 15))
             self.auto=cfg["auto"]
+            self._arm(SCHED.delay)
+            if cfg["live"]!=self.live:
+                self.live=cfg["live"]; self.restart_feeds()
         def edit_ex():
             def done(sel):
                 self.selected=set(sel) if sel else set(EXCHS.keys())
+                self.restart_feeds()
                 self.scan()
             ExchangesModal(self.selected, on_done=done).open()
         def api_keys():
             def updated(d):
                 self.api_store=d or {}
-                NET.store.clear()  # کلید عوض شد → کش شبکه‌ها پاک
+                NET.invalidate()  # کلید عوض شد → کش شبکه‌ها باید تازه شود
+                self.configure_engine()
             ApiKeysModal(self.api_store, on_apply=updated).open()
-        SettingsModal(init, on_apply=apply, on_exchs=edit_ex, on_keys=api_keys).open()
-    def scan(self):
+        SettingsModal(init, on_apply=apply, on_exchs=edit_ex, on_keys=api_keys, on_diag=lambda: DiagnosticsModal().open()).open()
+    def restart_feeds(self):
+        # REST snapshots are blocking → background thread
+        if self.live:
+            def run():
+                FEEDS.start(sorted(self.selected), QUOTES); self.configure_engine()
+            threading.Thread(target=run, daemon=True).start()
+        else:
+            FEEDS.stop(); self.configure_engine()
+    def configure_engine(self):
+        ENGINE.configure(sorted(self.selected) if self.live else None, QUOTES, float(self.notional),
+                         float(self.min_pct), float(self.min_abs), self.api_store)
+    @mainthread
+    def _on_events(self, events):
+        for kind, k, row in events:
+            if kind=="remove": self._rows.pop(k, None)
+            else:
+                if "since" not in row: row["since"]=HISTORY.since(route_of(row))
+                self._rows[k]=row
+        # چند batch پشت‌سرهم → یک بار رسم
+        if not self._render_ev: self._render_ev=Clock.schedule_once(self._render, 0.5)
+    def shown(self, rows):
+        # quote filter is applied on display only; "All" keeps cross-quote and every single-quote row
+        if self.quote=="All": return rows
+        return [r for r in rows if self.quote in (r["q"], r["q2"])]
+    def _show(self, rows):
+        # best self.limit rows of the display filter; the rest only show up as a count on "More"
+        rows=self.shown(rows)
+        top=heapq.nsmallest(self.limit, rows, key=rank_key)
+        self.d_grid.set_rows(top)
+        n=len(rows)-len(top)+self._more
+        self.btn_more.text=f"More ({n})" if n else "More"; self.btn_more.disabled=not n
+    def more(self):
+        # next page from what the last scan built; past that the next scan builds further
+        self.limit+=PAGE
+        self._render()
+        if self._more and len(self._rows)<self.limit+PAGE: self.scan()
+    def _render(self, *_):
+        self._render_ev=None
+        with METRICS.stage("render"):
+            self._show(list(self._rows.values()))
+    def _arm(self, delay):
+        if self._ev: self._ev.cancel(); self._ev=None
+        if self.auto: self._ev=Clock.schedule_once(lambda *_: self.scan(auto=True), delay)
+    def scan(self, auto=False):
+        # a user-started scan covers every selected venue; auto scans go where SCHED sends them
         if self.running: return
+        SCHED.battery=on_battery()
+        exs, full = SCHED.plan(sorted(self.selected), self.api_store, force_full=not auto)
         self.running=True
-        threading.Thread(target=self._worker, daemon=True).start()
-    def _worker(self):
+        threading.Thread(target=self._worker, args=(exs, full), daemon=True).start()
+    def _worker(self, exs, full):
         try:
-            qts=(self.quote,)  # فعلاً یک کوُت
-            rows=scan_real(sorted(self.selected), quotes=qts, notional=float(self.notional),
-                           min_pct=float(self.min_pct), min_abs=float(self.min_abs), api_keys=self.api_store)
-            self._on_results(rows)
+            stats={}; t0=time.perf_counter()
+            rows=scan_real(exs, quotes=QUOTES, notional=float(self.notional),
+                           min_pct=float(self.min_pct), min_abs=float(self.min_abs), api_keys=self.api_store,
+                           live=self.live, depth=self.depth, cycles=self.cycles, stats=stats, max_skew=MAX_SKEW,
+                           limit=self.limit+PAGE)
+            SCHED.record(exs, full, rows, stats, time.perf_counter()-t0)
+            HISTORY.record(rows, stats)   # "since" on each row now, the write on the history thread
+            self._on_results(rows, stats, exs, full)
         except Exception:
-            self._on_results([])
+            self._on_results([], {}, exs, full)
     @mainthread
-    def _on_results(self, rows):
-        self.d_grid.set_rows(rows); self.running=False
+    def _on_results(self, rows, stats, exs=(), full=True):
+        # a hot scan only speaks for routes between the venues it covered; the others keep their last full-scan row
+        if full: self._rows={}
+        else:
+            covered=set(exs); self._rows={k:r for k,r in self._rows.items() if not row_exchanges(r)<=covered}
+        self._rows.update((r["key"], r) for r in rows); self._more=stats.get("more", 0)
+        with METRICS.stage("render"):
+            self._show(list(self._rows.values()))
+        self.running=False
+        self.status.text="  ".join(x for x in (fmt_latency(stats.get("lat") or {}, stats.get("live") or ()),
+                                               fmt_quotes(stats.get("quotes") or {}),
+                                               fmt_pending(stats.get("wallets_pending") or {}),
+                                               fmt_throttled(stats.get("throttled") or {}),
+                                               fmt_stale(stats.get("stale")),
+                                               fmt_sched(SCHED.status()) if self.auto else "") if x)
+        self._arm(SCHED.delay)
 
 class ArbApp(App):
     def build(self):
         from kivy.core.window import Window
         Window.clearcolor=(0.06,0.06,0.06,1)
+        NET.attach(os.path.join(self.user_data_dir, "netcache.bin"))
+        HISTORY.open(os.path.join(self.user_data_dir, "history.db"))
         return Root()
+    def on_pause(self):
+        NET.save(); return True
+    def on_stop(self):
+        FEEDS.stop(); NET.save(); HISTORY.close()
 
 if __name__ == "__main__":
     ArbApp().run()
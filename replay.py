@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+# Record / replay: the raw REST payloads behind every scan, streamed to gzip JSONL, then fed back through the same
+# parse → join → route → filter pipeline (engine.scan_books) as fast as the CPU allows, for parameter sweeps.
+#   python cli.py --keys secrets.enc --record day.jsonl.gz ...          record while scanning
+#   python replay.py info day.jsonl.gz
+#   python replay.py sweep day.jsonl.gz --notional 100 500 --min-pct 0.2 0.5 --min-abs 0.5 1 \
+#                          [--fee-scale 1 1.25] [--taker binance=0.00075] [--min-run 2] [--workers 4] [--cycles]
+# Stream lines: {"k": request key, "t": time, "b": body}   a payload that differs from the last one under its key
+#               {"scan": n, "t": time, "ex": [...], "book_ts": {...}}   after every scan
+# Request keys drop per-call auth (timestamp, signature, nonce), so signed catalogs and Kraken lookups replay too.
+import os, sys, json, time, gzip, hashlib, argparse, itertools, threading
+import urllib.parse as urlparse
+from concurrent.futures import ProcessPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+import engine
+
+AUTH_PARAMS = {"timestamp", "signature", "recvWindow", "nonce", "sign"}
+REPLAY_KEYS = {ex:{"api_key":"replay", "secret":"cmVwbGF5", "passphrase":"replay"} for ex in engine.EXCHS}
+
+def request_key(req):
+    # "METHOD host/path?sorted params" from a PreparedRequest, auth parameters left out
+    u=urlparse.urlsplit(req.url)
+    ps=urlparse.parse_qsl(u.query)
+    body=req.body.decode() if isinstance(req.body, bytes) else req.body
+    if body and "=" in body: ps+=urlparse.parse_qsl(body)
+    qs=urlparse.urlencode(sorted((k, v) for k, v in ps if k not in AUTH_PARAMS))
+    return f"{req.method} {u.hostname}{u.path}" + (f"?{qs}" if qs else "")
+
+# ---------- Recorder ----------
+class Recorder:
+    # engine.HTTP_TAPS hook: every 200 lands here; unchanged payloads (same digest as last time) are not written again
+    def __init__(self, path):
+        self.path=path; self.f=gzip.open(path, "at", compresslevel=6, encoding="utf-8")
+        self.last={}; self.n=0; self.bytes=0; self._lock=threading.Lock()
+        engine.HTTP_TAPS.append(self.tap)
+    def tap(self, r):
+        if r.status_code!=200 or not r.content: return
+        k=request_key(r.request); h=hashlib.blake2b(r.content, digest_size=16).digest()
+        with self._lock:
+            if self.last.get(k)==h: return
+            self.last[k]=h; self.bytes+=len(r.content)
+            self.f.write(json.dumps({"k":k, "t":round(time.time(), 3), "b":r.content.decode("utf-8", "replace")})+"\n")
+    def scan(self, ts, exchanges, stats=None):
+        with self._lock:
+            self.n+=1
+            self.f.write(json.dumps({"scan":self.n, "t":round(ts, 3), "ex":list(exchanges),
+                                     "book_ts":(stats or {}).get("book_ts") or {}})+"\n")
+            self.f.flush()   # a crash loses at most the scan in progress
+    def close(self):
+        if self.tap in engine.HTTP_TAPS: engine.HTTP_TAPS.remove(self.tap)
+        with self._lock: self.f.close()
+
+# ---------- Replay ----------
+def frames(path):
+    # -> (scan marker, state {key: body}, keys changed since the previous scan); a torn last line ends the stream
+    state={}; changed=set()
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        try:
+            for line in f:
+                d=json.loads(line)
+                if "k" in d: state[d["k"]]=d["b"].encode(); changed.add(d["k"])
+                elif "scan" in d:
+                    yield d, state, changed; changed=set()
+        except (EOFError, ValueError): return
+
+class ReplayAdapter(HTTPAdapter):
+    # serves the recorded state; a key recorded with other parameters (Kraken's pair filter) falls back to the
+    # latest body of the same endpoint, per-asset private lookups never do
+    def __init__(self, state, **kw):
+        super().__init__(**kw); self.state=state; self.miss=0
+    def send(self, request, **kw):
+        k=request_key(request); body=self.state.get(k)
+        if body is None and "/private/" not in k:
+            base=k.split("?")[0]
+            body=next((b for kk, b in reversed(self.state.items()) if kk.split("?")[0]==base), None)
+        r=requests.Response()
+        r.status_code=200 if body is not None else 404
+        r._content=body if body is not None else b'{"error":"not recorded"}'
+        if body is None: self.miss+=1
+        r.headers["Content-Type"]="application/json"; r.url=request.url; r.request=request; r.encoding="utf-8"
+        return r
+
+def install(state):
+    # every engine session answers from the recording, including hosts first met later in the stream (session_for is
+    # wrapped, so a new session is mounted as it is made); rate budgets are lifted (nothing leaves the machine)
+    ad=ReplayAdapter(state); make=engine.session_for
+    def session_for(url):
+        host, s = make(url)
+        if s.adapters.get("https://") is not ad: s.mount("https://", ad); s.mount("http://", ad)
+        return host, s
+    engine.session_for=session_for
+    with engine._sess_lock: sessions=list(engine._SESSIONS.values())
+    for s in sessions: s.mount("https://", ad); s.mount("http://", ad)
+    for b in engine.GOV.buckets.values(): b.rate=b.burst=b.tokens=1e9
+    return ad
+
+class Tally:
+    # one configuration over the whole replay: rows, runs (consecutive scans a route stays up) and P&L of acting on a
+    # route once it has been up for min_run scans, at the net $ of that scan
+    def __init__(self, min_run):
+        self.min_run=min_run; self.open={}; self.runs=[]
+        self.scans=0; self.rows=0; self.routes=set(); self.trades=0; self.pnl=0.0
+    def add(self, t, rows):
+        self.scans+=1; self.rows+=len(rows); seen=set()
+        for r in rows:
+            k=(r["sym"], r["src"], r["dst"]); seen.add(k); self.routes.add(k)
+            o=self.open.get(k)
+            if o is None: o=self.open[k]=[t, t, 0]
+            o[1]=t; o[2]+=1
+            if o[2]==self.min_run: self.trades+=1; self.pnl+=r["net$"]
+        for k in [k for k in self.open if k not in seen]: self.runs.append(self.open.pop(k))
+    def result(self):
+        runs=self.runs+list(self.open.values())
+        n=sorted(r[2] for r in runs)
+        return {"scans":self.scans, "rows":self.rows, "rows_per_scan":round(self.rows/max(1, self.scans), 2),
+                "routes":len(self.routes), "runs":len(runs), "run_scans_median":n[len(n)//2] if n else 0,
+                "run_s_mean":round(sum(r[1]-r[0] for r in runs)/max(1, len(runs)), 1),
+                "trades":self.trades, "pnl":round(self.pnl, 2)}
+
+def set_fees(base, cfg):
+    engine.TAKER_FEE.clear()
+    engine.TAKER_FEE.update({ex:f*cfg["fee_scale"] for ex, f in base.items()})
+    engine.TAKER_FEE.update(cfg.get("taker") or {})
+
+def run_configs(path, configs, min_run=2, cycles=False, limit=None):
+    # one pass over the recording for a list of configurations; each snapshot is parsed once and shared by all
+    state={}; ad=None; books={}; base=dict(engine.TAKER_FEE)
+    tallies=[Tally(min_run) for _ in configs]; t0=time.perf_counter(); n=0
+    for marker, st, changed in frames(path):
+        if ad is None: state=st; ad=install(state)
+        exs=marker["ex"]
+        touched={engine.host_exchange(urlparse.urlsplit("https://"+k.split(" ", 1)[1]).hostname) for k in changed}
+        for ex in exs:
+            if ex in touched or ex not in books:
+                books[ex]=engine.fetch_parsed(("tickers", ex), engine.TICKERS[ex])[0] or {}
+                if ex not in engine.LAZY_NETS: engine.NET._load(ex, REPLAY_KEYS[ex])
+        snap={ex:books[ex] for ex in exs}
+        for ex in exs:
+            if ex in engine.LAZY_NETS: engine.ASSETS.want(ex, engine.overlap_assets(ex, snap), REPLAY_KEYS)
+        engine.ASSETS.drain(60)
+        rates=engine.quote_rates(snap)
+        for cfg, tl in zip(configs, tallies):
+            set_fees(base, cfg)
+            tl.add(marker["t"], engine.scan_books(snap, rates, cfg["notional"], cfg["min_pct"], cfg["min_abs"],
+                                                  REPLAY_KEYS, cycles=cycles))
+        n+=1
+        if limit and n>=limit: break
+    set_fees(base, {"fee_scale":1.0})
+    el=time.perf_counter()-t0
+    return [dict(cfg, **tl.result(), replay_s=round(el, 1), misses=ad.miss if ad else 0) for cfg, tl in zip(configs, tallies)]
+
+def grid(a):
+    taker=dict((k, float(v)) for k, v in (x.split("=", 1) for x in a.taker or []))
+    return [{"notional":n, "min_pct":p, "min_abs":m, "fee_scale":f, "taker":taker}
+            for n, p, m, f in itertools.product(a.notional, a.min_pct, a.min_abs, a.fee_scale)]
+
+def sweep(a):
+    cfgs=grid(a); w=max(1, min(a.workers, len(cfgs)))
+    parts=[cfgs[i::w] for i in range(w)]
+    t0=time.perf_counter()
+    if w==1: res=run_configs(a.file, cfgs, a.min_run, a.cycles, a.limit)
+    else:
+        # configurations are split across processes; each streams the file itself, so runs stay in time order
+        with ProcessPoolExecutor(max_workers=w) as pool:
+            res=[r for part in pool.map(run_configs, [a.file]*w, parts, [a.min_run]*w, [a.cycles]*w, [a.limit]*w)
+                 for r in part]
+    res.sort(key=lambda r: -r["pnl"])
+    for r in res: print(json.dumps(r))
+    print(json.dumps({"configs":len(cfgs), "workers":w, "wall_s":round(time.perf_counter()-t0, 1)}), file=sys.stderr)
+
+def info(a):
+    n=0; first=last=None; keys={}; size=os.path.getsize(a.file)
+    for marker, st, changed in frames(a.file):
+        n+=1; first=first or marker["t"]; last=marker["t"]
+        for k in changed: keys[k]=keys.get(k, 0)+1
+    print(json.dumps({"scans":n, "span_s":round((last or 0)-(first or 0)), "file_kb":size//1024,
+                      "keys":len(keys), "changes":keys}, indent=1))
+
+def main():
+    ap=argparse.ArgumentParser(description="ArbTracker record/replay")
+    sub=ap.add_subparsers(dest="cmd", required=True)
+    p=sub.add_parser("info"); p.add_argument("file")
+    p=sub.add_parser("sweep"); p.add_argument("file")
+    p.add_argument("--notional", nargs="+", type=float, default=[100.0])
+    p.add_argument("--min-pct", nargs="+", type=float, default=[0.2])
+    p.add_argument("--min-abs", nargs="+", type=float, default=[0.5])
+    p.add_argument("--fee-scale", nargs="+", type=float, default=[1.0])
+    p.add_argument("--taker", nargs="*", help="ex=fee overrides, e.g. binance=0.00075")
+    p.add_argument("--min-run", type=int, default=2, help="scans a route must stay up before it counts as a trade")
+    p.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    p.add_argument("--cycles", action="store_true"); p.add_argument("--limit", type=int, default=None)
+    a=ap.parse_args()
+    {"info":info, "sweep":sweep}[a.cmd](a)
+
+if __name__=="__main__":
+    main()